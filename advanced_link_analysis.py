@@ -1,56 +1,100 @@
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
-from typing import Dict, List, Set, Tuple
+from plotly.subplots import make_subplots
+from types import MappingProxyType
+from typing import Callable, Dict, FrozenSet, List, Mapping, Set, Tuple
 import streamlit as st
 import re
+import warnings
+from link_analysis import intern_links
+from data_processing import relations_to_arrays, CACHE_HASH_FUNCS
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick est optionnel : repli sur une expression régulière
+    ahocorasick = None
 
+# Couleurs des catégories de nombre d'ancres distinctes
+ANCHOR_CATEGORY_COLORS = {'1-6': '#E9B4B4', '7-10': '#f0d1a0', '11+': '#B4D9C4'}
+
+# Nombre de termes de filtrage à partir duquel un automate d'Aho-Corasick est utilisé
+AHOCORASICK_MIN_TERMS = 20
+
+# Type des colonnes de texte des tableaux affichés (chaînes Arrow, sérialisées sans copie vers Streamlit)
+ARROW_STRING_DTYPE = 'string[pyarrow]'
+
+# Nombre de pages affichées dans le classement des pages avec le plus d'ancres distinctes
+TOP_ANCHOR_PAGES = 20
+
+# Valeur par défaut partagée des recherches dans les index, sans allocation à chaque appel
+EMPTY_SEQUENCE: Tuple = ()
+
+# Description des principaux codes HTTP d'erreur
+STATUS_TEXTS = {
+    400: "Mauvaise requête",
+    401: "Non autorisé",
+    403: "Accès interdit",
+    404: "Page non trouvée",
+    500: "Erreur interne du serveur",
+    503: "Service indisponible"
+}
+
+
+@st.cache_data(show_spinner=False)
 def analyze_broken_links(inlinks_df: pd.DataFrame) -> Tuple[int, pd.DataFrame]:
     """
     Analyse les liens cassés (404 et autres erreurs) dans le fichier d'inlinks.
+    Mis en cache : ne dépend d'aucun slider.
 
     Returns:
         Tuple contenant le nombre total de liens cassés et un DataFrame avec les détails
     """
-    # Filtrer les liens avec des codes d'erreur (4xx et 5xx)
-    error_links = inlinks_df[inlinks_df['Status Code'] >= 400].copy()
+    # Filtrer les liens avec des codes d'erreur (4xx et 5xx), sans copie défensive
+    is_error = inlinks_df['Status Code'] >= 400
+    error_links = inlinks_df.loc[is_error]
 
     # Regrouper par URL cible et code d'erreur
-    error_summary = error_links.groupby(['To', 'Status Code']).size().reset_index(name='Nombre de liens')
+    error_counts = error_links.groupby(['To', 'Status Code'], sort=False, observed=True).size()
+
+    return int(is_error.sum()), summarize_error_counts(error_counts)
+
+
+def summarize_error_counts(error_counts: pd.Series) -> pd.DataFrame:
+    """Met en forme les comptes de liens cassés indexés par (To, Status Code)."""
+    error_summary = error_counts.reset_index(name='Nombre de liens')
 
     # Ajouter le statut HTTP en texte
-    error_summary['Statut'] = error_summary['Status Code'].apply(get_status_text)
+    error_summary['Statut'] = error_summary['Status Code'].map(STATUS_TEXTS) \
+        .fillna('Erreur ' + error_summary['Status Code'].astype(str)).astype(ARROW_STRING_DTYPE)
+    error_summary = compact_url_counts(error_summary, 'Nombre de liens')
 
     # Ordonner par nombre de liens décroissant
-    error_summary = error_summary.sort_values('Nombre de liens', ascending=False)
+    return error_summary.sort_values('Nombre de liens', ascending=False)
 
-    return len(error_links), error_summary
 
-
-def get_status_text(status_code: int) -> str:
-    """Retourne la description d'un code HTTP."""
-    status_texts = {
-        400: "Mauvaise requête",
-        401: "Non autorisé",
-        403: "Accès interdit",
-        404: "Page non trouvée",
-        500: "Erreur interne du serveur",
-        503: "Service indisponible"
-    }
-    return status_texts.get(status_code, f"Erreur {status_code}")
+def compact_url_counts(counts_df: pd.DataFrame, count_column: str) -> pd.DataFrame:
+    """
+    Réduit les types d'un DataFrame de comptes par URL cible : comptes en entiers non signés
+    au plus court et URLs en chaînes Arrow, pour alléger les filtres et l'affichage.
+    """
+    counts_df[count_column] = pd.to_numeric(counts_df[count_column], downcast='unsigned')
+    counts_df['To'] = counts_df['To'].astype(ARROW_STRING_DTYPE)
+    return counts_df
 
 
+@st.cache_data(show_spinner=False)
 def analyze_incoming_links_stats(inlinks_df: pd.DataFrame) -> Dict:
     """
     Calcule les statistiques sur les liens entrants.
+    Mis en cache : ne dépend d'aucun slider.
 
     Returns:
         Un dictionnaire avec diverses statistiques
     """
     # Nombre de liens reçus par URL cible
-    incoming_links = inlinks_df.groupby('To').size().reset_index(name='Liens reçus')
+    incoming_links = inlinks_df.groupby('To', sort=False, observed=True).size().reset_index(name='Liens reçus')
+    incoming_links = compact_url_counts(incoming_links, 'Liens reçus')
 
     # Nombre moyen de liens reçus par page
     avg_links_per_page = incoming_links['Liens reçus'].mean()
@@ -71,9 +115,11 @@ def analyze_incoming_links_stats(inlinks_df: pd.DataFrame) -> Dict:
     }
 
 
+@st.cache_data(show_spinner=False)
 def analyze_anchor_distribution(inlinks_df: pd.DataFrame) -> Dict:
     """
     Analyse la distribution des textes d'ancre dans les liens.
+    Mis en cache : ne dépend d'aucun slider.
 
     Returns:
         Un dictionnaire avec les statistiques et visualisations sur les ancres
@@ -82,8 +128,10 @@ def analyze_anchor_distribution(inlinks_df: pd.DataFrame) -> Dict:
     unique_links = inlinks_df[['From', 'To', 'Anchor Text']].drop_duplicates()
 
     # Compter le nombre d'ancres différentes pour chaque cible
-    anchor_counts = unique_links.groupby(['To', 'Anchor Text']).size().reset_index(name='count')
-    distinct_anchors = anchor_counts.groupby('To').size().reset_index(name='Ancres distinctes')
+    distinct_anchors = unique_links.groupby('To', sort=False, observed=True)['Anchor Text'].nunique()
+    # Les cibles sans aucune ancre renseignée ne sont pas comptées
+    distinct_anchors = distinct_anchors[distinct_anchors > 0].reset_index(name='Ancres distinctes')
+    distinct_anchors = compact_url_counts(distinct_anchors, 'Ancres distinctes')
 
     # Calculer la moyenne d'ancres distinctes par page
     avg_anchors = distinct_anchors['Ancres distinctes'].mean()
@@ -95,67 +143,86 @@ def analyze_anchor_distribution(inlinks_df: pd.DataFrame) -> Dict:
     anchor_dist = distinct_anchors['Ancres distinctes'].value_counts().sort_index().reset_index()
     anchor_dist.columns = ['Nombre d\'ancres distinctes', 'Nombre d\'URLs']
 
+    # Catégoriser les ancres
+    anchor_dist['Catégorie'] = pd.cut(anchor_dist['Nombre d\'ancres distinctes'],
+                                      bins=[0, 6, 10, np.inf], labels=['1-6', '7-10', '11+'])
+
     return {
         'distinct_anchors': distinct_anchors,
         'avg_anchors': avg_anchors,
         'median_anchors': median_anchors,  # Ajout de la médiane
         'anchor_dist': anchor_dist,
-        'anchor_counts': anchor_counts,  # Ajout pour l'accès aux ancres spécifiques par page
-        'unique_links': unique_links  # Ajout pour l'accès aux liens pointant vers cette page
+        # Classement calculé une fois avec l'analyse (sélection partielle, sans tri complet)
+        'top_anchors': distinct_anchors.nlargest(TOP_ANCHOR_PAGES, 'Ancres distinctes'),
+        # Pages triées par nombre d'ancres croissant, pour filtrer le seuil maximal par dichotomie
+        'anchors_by_count': distinct_anchors.sort_values('Ancres distinctes', kind='stable')
     }
 
 
+def index_by_target(links_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Trie les liens par URL cible et les indexe sur cette colonne (conservée),
+    pour que la sélection des liens d'une URL soit une recherche dichotomique.
+    """
+    return links_df.sort_values('To', kind='stable').set_index('To', drop=False).rename_axis(None)
+
+
+@st.cache_resource(show_spinner=False)
+def index_links_by_target(inlinks_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Indexe par URL cible tous les liens et les liens uniques (From, To, ancre), pour l'accès
+    aux liens pointant vers une page. Mis en cache et partagé sans copie entre les exécutions :
+    les DataFrames sont en lecture seule.
+
+    Returns:
+        Tuple (liens indexés par cible, liens uniques indexés par cible)
+    """
+    links = inlinks_df[['From', 'To', 'Anchor Text']]
+    return index_by_target(links), index_by_target(links.drop_duplicates())
+
+
+def select_target(indexed_links: pd.DataFrame, url: str) -> pd.DataFrame:
+    """Sélectionne les liens pointant vers une URL dans un DataFrame produit par index_by_target."""
+    try:
+        location = indexed_links.index.get_loc(url)
+    except KeyError:
+        return indexed_links.iloc[0:0]
+
+    if isinstance(location, (int, np.integer)):
+        return indexed_links.iloc[[location]]
+    return indexed_links.iloc[location]
+
+
+@st.cache_data(show_spinner=False)
 def create_anchor_distribution_chart(anchor_dist: pd.DataFrame) -> go.Figure:
     """
     Crée un graphique de la distribution des ancres.
+    Mis en cache : la figure n'est reconstruite que si la distribution change.
     """
 
-    # Catégoriser les ancres
-    def categorize_anchors(n):
-        if n <= 6:
-            return '1-6'
-        elif n <= 10:
-            return '7-10'
-        else:
-            return '11+'
-
-    # Ajout de la catégorie
-    anchor_dist['Catégorie'] = anchor_dist['Nombre d\'ancres distinctes'].apply(categorize_anchors)
-
-    # Graphique en barres
-    fig_bar = px.bar(
-        anchor_dist,
-        x='Nombre d\'ancres distinctes',
-        y='Nombre d\'URLs',
-        labels={'x': 'Nombre d\'ancres distinctes', 'y': 'Nombre d\'URLs'},
-        title='Distribution du nombre d\'ancres distinctes par URL',
-        color='Catégorie',
-        color_discrete_map={'1-6': '#E9B4B4', '7-10': '#f0d1a0', '11+': '#B4D9C4'}
-    )
-
     # Camembert pour les catégories
-    category_counts = anchor_dist.groupby('Catégorie')['Nombre d\'URLs'].sum().reset_index()
-
-    fig_pie = px.pie(
-        category_counts,
-        values='Nombre d\'URLs',
-        names='Catégorie',
-        title='Répartition du nombre d\'ancres différentes par lien',
-        color='Catégorie',
-        color_discrete_map={'1-6': '#E9B4B4', '7-10': '#f0d1a0', '11+': '#B4D9C4'}
-    )
+    category_counts = anchor_dist.groupby('Catégorie', observed=True)['Nombre d\'URLs'].sum()
 
     # Combiner les graphiques dans une figure composée
-    from plotly.subplots import make_subplots
     fig = make_subplots(rows=1, cols=2, specs=[[{"type": "pie"}, {"type": "xy"}]])
 
     # Ajouter le camembert
-    for trace in fig_pie.data:
-        fig.add_trace(trace, row=1, col=1)
-
-    # Ajouter le graphique en barres
-    for trace in fig_bar.data:
-        fig.add_trace(trace, row=1, col=2)
+    fig.add_trace(go.Pie(
+        labels=category_counts.index.astype(str),
+        values=category_counts.to_numpy(),
+        marker_colors=[ANCHOR_CATEGORY_COLORS[category] for category in category_counts.index],
+        sort=False
+    ), row=1, col=1)
+
+    # Ajouter le graphique en barres (une série par catégorie)
+    for category, category_dist in anchor_dist.groupby('Catégorie', observed=True):
+        fig.add_trace(go.Bar(
+            x=category_dist['Nombre d\'ancres distinctes'].to_numpy(),
+            y=category_dist['Nombre d\'URLs'].to_numpy(),
+            name=category,
+            marker_color=ANCHOR_CATEGORY_COLORS[category],
+            showlegend=False
+        ), row=1, col=2)
 
     # Mise en page
     fig.update_layout(
@@ -167,23 +234,62 @@ def create_anchor_distribution_chart(anchor_dist: pd.DataFrame) -> go.Figure:
     return fig
 
 
+@st.cache_data(show_spinner=False)
+def compute_cannibal_anchors(inlinks_df: pd.DataFrame) -> Set[str]:
+    """
+    Identifie les ancres cannibales (même texte utilisé vers différentes pages).
+    Mis en cache pour n'analyser le fichier d'inlinks qu'une fois par session.
+    """
+    targets_per_anchor = inlinks_df.groupby('Anchor Text', sort=False, observed=True)['To'].nunique()
+    return set(targets_per_anchor[targets_per_anchor > 1].index)
+
+
+@st.cache_resource(show_spinner=False, hash_funcs=CACHE_HASH_FUNCS)
+def index_similar_sources(related_pages: Dict[str, List[Dict]]) -> Mapping[str, Tuple[Tuple[str, float], ...]]:
+    """
+    Construit l'index inversé des similarités : pour chaque URL cible,
+    les URLs sources (et scores) qui la comptent parmi leurs pages similaires.
+    Mis en cache et partagé sans copie entre les exécutions : l'index est en lecture seule.
+    """
+    sources, targets, scores = relations_to_arrays(related_pages)
+
+    # Regrouper les relations par cible via leurs codes entiers (tri stable : l'ordre des sources est conservé)
+    target_codes, unique_targets = pd.factorize(targets)
+    order = np.argsort(target_codes, kind='stable')
+    bounds = np.cumsum(np.bincount(target_codes, minlength=len(unique_targets)))[:-1]
+
+    return MappingProxyType({
+        target_url: tuple(zip(target_sources.tolist(), target_scores.tolist()))
+        for target_url, target_sources, target_scores in zip(unique_targets,
+                                                            np.split(sources[order], bounds),
+                                                            np.split(scores[order], bounds))
+    })
+
+
 def get_url_detail_info(url: str, inlinks_df: pd.DataFrame,
-                        anchor_stats: Dict, related_pages: Dict, existing_links: Dict[str, Set[str]] = None) -> Dict:
+                        related_pages: Dict, existing_links: Dict[str, Set[str]] = None,
+                        cannibal_anchors: Set[str] = None,
+                        similar_sources: Mapping[str, Tuple[Tuple[str, float], ...]] = None,
+                        link_index: Tuple[Mapping[str, int], FrozenSet[Tuple[int, int]]] = None) -> Dict:
     """
     Récupère les informations détaillées pour une URL spécifique.
 
     Args:
         url: L'URL à analyser
         inlinks_df: DataFrame des liens entrants
-        anchor_stats: Statistiques d'ancres
         related_pages: Dictionnaire des pages similaires
         existing_links: Dictionnaire des liens existants
+        cannibal_anchors: Ensemble des ancres cannibales (calculé si non fourni)
+        similar_sources: Index inversé de related_pages (calculé si non fourni)
+        link_index: Liens existants internés par intern_links (calculé si non fourni)
 
     Returns:
-        Un dictionnaire avec les informations détaillées
+        Un dictionnaire avec les informations détaillées ; les opportunités de maillage
+        sont un DataFrame (source_url, similarity_score, link_exists, is_reverse)
     """
     # Tous les liens pointant vers cette URL
-    incoming_links = inlinks_df[inlinks_df['To'] == url]
+    links_by_target, unique_links = index_links_by_target(inlinks_df)
+    incoming_links = select_target(links_by_target, url)
 
     # Nombre total de liens
     total_links = len(incoming_links)
@@ -192,7 +298,7 @@ def get_url_detail_info(url: str, inlinks_df: pd.DataFrame,
     unique_sources = incoming_links['From'].nunique()
 
     # Récupérer les ancres distinctes
-    unique_anchors = anchor_stats['unique_links'][anchor_stats['unique_links']['To'] == url]
+    unique_anchors = select_target(unique_links, url)
 
     # Liste des ancres distinctes
     anchor_list = unique_anchors['Anchor Text'].unique().tolist() if not unique_anchors.empty else []
@@ -202,123 +308,94 @@ def get_url_detail_info(url: str, inlinks_df: pd.DataFrame,
 
     # Pré-calculer tous les scores de similarité possibles pour cette URL
     if related_pages:
-        # Cas 1: Chercher dans related_pages les pages qui ont notre URL comme cible similaire
-        for source_url, pages in related_pages.items():
-            for page in pages:
-                if page['url'] == url:
-                    similarity_lookup[source_url] = page['score']
+        if similar_sources is None:
+            similar_sources = index_similar_sources(related_pages)
+
+        # Une seule recherche par index pour cette URL, réutilisée pour les opportunités
+        url_sources = similar_sources.get(url, EMPTY_SEQUENCE)
+        url_pages = related_pages.get(url, EMPTY_SEQUENCE)
+
+        # Cas 1: Les pages qui ont notre URL comme cible similaire (index inversé)
+        for source_url, score in url_sources:
+            similarity_lookup[source_url] = score
 
         # Cas 2: Chercher dans nos pages similaires celles qui sont sources de liens
-        if url in related_pages:
-            for page in related_pages[url]:
-                target_url = page['url']
-                if target_url not in similarity_lookup:  # Ne pas écraser les valeurs existantes
-                    similarity_lookup[target_url] = page['score']
+        for page in url_pages:
+            target_url = page['url']
+            if target_url not in similarity_lookup:  # Ne pas écraser les valeurs existantes
+                similarity_lookup[target_url] = page['score']
 
     # Liste des pages sources avec leurs ancres
-    source_pages = []
     sources_with_anchor = incoming_links[['From', 'Anchor Text']].drop_duplicates()
 
-    for _, row in sources_with_anchor.iterrows():
-        source_url = row['From']
-        anchor_text = row['Anchor Text']
-
-        # Récupérer le score du dictionnaire pré-calculé
-        similarity_score = similarity_lookup.get(source_url)
+    # Récupérer les scores du dictionnaire pré-calculé en une seule passe
+    similarities = sources_with_anchor['From'].map(similarity_lookup).astype(object)
+    similarities = similarities.where(similarities.notna(), None)
 
-        source_pages.append({
-            'url': source_url,
-            'anchor': anchor_text,
-            'similarity': similarity_score
-        })
+    source_pages = [
+        {'url': source_url, 'anchor': anchor_text, 'similarity': similarity_score}
+        for source_url, anchor_text, similarity_score in zip(sources_with_anchor['From'].to_numpy(),
+                                                              sources_with_anchor['Anchor Text'].to_numpy(),
+                                                              similarities.to_numpy())
+    ]
 
     # Vérifier si des ancres peuvent être considérées comme cannibales (même texte pour différentes pages)
-    anchor_counts = inlinks_df.groupby('Anchor Text')['To'].nunique().reset_index()
-    cannibal_anchors = anchor_counts[anchor_counts['To'] > 1]['Anchor Text'].tolist()
+    if cannibal_anchors is None:
+        cannibal_anchors = compute_cannibal_anchors(inlinks_df)
 
     # Filtrer pour ne garder que les ancres cannibales utilisées pour cette page
     page_cannibal_anchors = [a for a in anchor_list if a in cannibal_anchors]
 
-    # Trouver des opportunités de maillage interne
-    opportunities = []
-    processed_urls = set()  # Pour suivre les URLs déjà traitées
+    # Trouver des opportunités de maillage interne, dédupliquées par URL source
+    # (en cas de doublon, l'opportunité au score le plus élevé est conservée) :
+    # URL source -> (score de similarité, lien existant, lien inverse)
+    opportunities = {}
 
     # Vérifier que les données nécessaires sont disponibles
     if related_pages and existing_links is not None:
+        if link_index is None:
+            link_index = intern_links(existing_links)
+        url_ids, links = link_index
+        url_id = url_ids.get(url, -1)
+
         # Rechercher toutes les pages qui pourraient pointer vers notre URL
-        for source_url, similar_pages in related_pages.items():
+        for source_url, score in url_sources:
             # Ne pas considérer l'URL cible elle-même comme source
             if source_url == url:
                 continue
 
-            # Vérifier si l'URL cible est dans les pages similaires à la source
-            for page in similar_pages:
-                if page['url'] == url:
-                    # Éviter les doublons
-                    if source_url in processed_urls:
-                        continue
-                    processed_urls.add(source_url)
-
-                    # Vérifier si le lien n'existe pas déjà
-                    link_exists = False
-                    if source_url in existing_links:
-                        link_exists = url in existing_links[source_url]
-
-                    # Ajouter à la liste des opportunités
-                    if not link_exists:
-                        opportunities.append({
-                            'source_url': source_url,
-                            'similarity_score': page['score'],
-                            'link_exists': False
-                        })
-                    else:
-                        # Optionnel: Ajouter quand même mais marquer comme existant
-                        opportunities.append({
-                            'source_url': source_url,
-                            'similarity_score': page['score'],
-                            'link_exists': True
-                        })
+            existing = opportunities.get(source_url)
+            if existing is None or score > existing[0]:
+                # Vérifier si le lien existe déjà
+                link_exists = (url_ids.get(source_url, -1), url_id) in links
+
+                # Ajouter aux opportunités (en marquant les liens existants)
+                opportunities[source_url] = (score, link_exists, False)
 
         # Vérifier aussi si notre URL cible peut pointer vers d'autres pages similaires
-        if url in related_pages:
-            for target in related_pages[url]:
-                target_url = target['url']
-                # Ne pas considérer l'URL cible elle-même ou les URLs déjà traitées
-                if target_url == url or target_url in processed_urls:
-                    continue
-                processed_urls.add(target_url)
-
-                # Vérifier si le lien inverse existe déjà
-                link_exists = False
-                if url in existing_links:
-                    link_exists = target_url in existing_links[url]
-
-                if not link_exists:
-                    # Ajouter à la liste des opportunités mais marquer comme lien inverse
-                    opportunities.append({
-                        'source_url': target_url,
-                        'similarity_score': target['score'],
-                        'link_exists': False,
-                        'is_reverse': True
-                    })
-
-    # Trier les opportunités par score de similarité décroissant
-    opportunities = sorted(opportunities, key=lambda x: x['similarity_score'], reverse=True)
-
-    # Éliminer les éventuels doublons restants en utilisant un dictionnaire temporaire
-    unique_opportunities = {}
-    for opp in opportunities:
-        source_url = opp['source_url']
-        # Utiliser l'URL source comme clé pour éliminer les doublons
-        # Si un doublon existe avec un score plus élevé, le conserver
-        if source_url not in unique_opportunities or opp['similarity_score'] > unique_opportunities[source_url][
-            'similarity_score']:
-            unique_opportunities[source_url] = opp
-
-    # Convertir le dictionnaire en liste et remplacer la liste originale
-    opportunities = list(unique_opportunities.values())
-    # Re-trier après l'élimination des doublons
-    opportunities = sorted(opportunities, key=lambda x: x['similarity_score'], reverse=True)
+        for target in url_pages:
+            target_url = target['url']
+            # Ne pas considérer l'URL cible elle-même ou les URLs déjà traitées
+            if target_url == url or target_url in opportunities:
+                continue
+
+            # Vérifier si le lien inverse existe déjà
+            link_exists = (url_id, url_ids.get(target_url, -1)) in links
+
+            if not link_exists:
+                # Ajouter aux opportunités mais marquer comme lien inverse
+                opportunities[target_url] = (target['score'], False, True)
+
+    # Opportunités en colonnes, triées par score de similarité décroissant (tri stable)
+    scores, link_exists, is_reverse = (np.array(column) for column in zip(*opportunities.values())) \
+        if opportunities else (np.empty(0), np.empty(0, dtype=bool), np.empty(0, dtype=bool))
+    order = np.argsort(-scores, kind='stable')
+    opportunities_df = pd.DataFrame({
+        'source_url': np.array(list(opportunities), dtype=object)[order],
+        'similarity_score': scores[order].astype(np.float32),
+        'link_exists': link_exists[order].astype(bool),
+        'is_reverse': is_reverse[order].astype(bool)
+    })
 
     return {
         'url': url,
@@ -328,54 +405,129 @@ def get_url_detail_info(url: str, inlinks_df: pd.DataFrame,
         'anchor_list': anchor_list,
         'cannibal_anchors': page_cannibal_anchors,
         'source_pages': source_pages,
-        'linking_opportunities': opportunities
+        'linking_opportunities': opportunities_df
     }
-def filter_urls_by_regex(urls: List[str], regex_pattern: str) -> List[str]:
+
+
+@st.cache_resource(show_spinner=False)
+def url_index(urls: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Filtre une liste d'URLs en utilisant une expression régulière.
+    Précalcule, une fois par jeu d'URLs, le tableau des URLs et sa version en minuscules,
+    réutilisés par les filtres de la vue détaillée à chaque rerun. Tableaux d'objets en
+    lecture seule, partagés sans copie entre les reruns.
 
     Args:
-        urls: Liste des URLs à filtrer
-        regex_pattern: Pattern regex à utiliser pour le filtrage
+        urls: Série des URLs
 
     Returns:
-        Liste des URLs filtrées
+        Tuple (URLs d'origine, URLs en minuscules)
     """
-    if not regex_pattern:
-        return urls
+    urls = urls.astype(str)
+    url_values = urls.to_numpy(dtype=object)
+    lowered_urls = urls.str.lower().to_numpy(dtype=object)
+    url_values.flags.writeable = False
+    lowered_urls.flags.writeable = False
+    return url_values, lowered_urls
 
-    try:
-        # Utilisation de flags=re.IGNORECASE pour une recherche insensible à la casse
-        pattern = re.compile(regex_pattern, flags=re.IGNORECASE)
-        return [url for url in urls if pattern.search(url)]
-    except re.error:
-        # En cas d'erreur dans l'expression régulière
-        st.error(f"Expression régulière invalide: {regex_pattern}")
-        return urls
 
+def contains_any(lowered_urls: pd.Series, terms: List[str]) -> np.ndarray:
+    """
+    Masque des URLs en minuscules contenant au moins un des termes : un passage vectorisé
+    par terme, ou une seule alternative regex au-delà de AHOCORASICK_MIN_TERMS termes.
+    """
+    if len(terms) >= AHOCORASICK_MIN_TERMS:
+        return lowered_urls.str.contains(compile_terms_pattern(terms)).to_numpy(dtype=bool, copy=True)
+
+    mask = np.zeros(len(lowered_urls), dtype=bool)
+    for term in terms:
+        mask |= lowered_urls.str.contains(term.lower(), regex=False).to_numpy(dtype=bool)
+    return mask
 
-def apply_simple_filters(urls: List[str], include_terms: List[str], exclude_terms: List[str]) -> List[str]:
+
+def filter_url_series(urls: pd.Series, include_pattern: str = "", exclude_pattern: str = "",
+                      regex_pattern: str = "") -> List[str]:
     """
-    Applique des filtres simples d'inclusion et d'exclusion.
+    Filtre une série d'URLs par sous-chaîne à inclure ou exclure (insensibles à la casse)
+    (via terms_mask) et par expression régulière, en combinant des masques vectorisés
+    sur l'index des URLs mis en cache par url_index.
 
     Args:
-        urls: Liste des URLs à filtrer
-        include_terms: Termes à inclure (si au moins un est présent)
-        exclude_terms: Termes à exclure (si au moins un est présent)
+        urls: Série des URLs à filtrer
+        include_pattern: Sous-chaîne que les URLs doivent contenir
+        exclude_pattern: Sous-chaîne que les URLs ne doivent pas contenir
+        regex_pattern: Pattern regex à utiliser pour le filtrage
 
     Returns:
         Liste des URLs filtrées
     """
-    filtered_urls = urls
+    url_values, _ = url_index(urls)
 
-    # Filtrer par termes d'inclusion (OR logic)
-    if include_terms:
-        filtered_urls = [url for url in filtered_urls
-                         if any(term.lower() in url.lower() for term in include_terms)]
+    # Sous-chaînes à inclure et à exclure : même filtre que les listes de termes
+    mask = terms_mask(urls, [include_pattern] if include_pattern else [],
+                      [exclude_pattern] if exclude_pattern else [])
+
+    if regex_pattern:
+        try:
+            # re met en cache les patterns compilés : pas de recompilation d'un rerun à l'autre
+            pattern = re.compile(regex_pattern, flags=re.IGNORECASE)
+            with warnings.catch_warnings():
+                # Les groupes éventuels de l'expression sont sans effet sur le filtrage
+                warnings.simplefilter('ignore', UserWarning)
+                mask &= pd.Series(url_values, dtype=object, copy=False).str.contains(pattern, na=False) \
+                    .to_numpy(dtype=bool)
+        except re.error:
+            st.error(f"Expression régulière invalide: {regex_pattern}")
+
+    return url_values[mask].tolist()
 
-    # Filtrer par termes d'exclusion
-    if exclude_terms:
-        filtered_urls = [url for url in filtered_urls
-                         if not any(term.lower() in url.lower() for term in exclude_terms)]
 
-    return filtered_urls
\ No newline at end of file
+def compile_terms_pattern(terms: List[str]) -> re.Pattern:
+    """Compile une liste de termes littéraux en une seule alternative insensible à la casse."""
+    return re.compile('|'.join(map(re.escape, terms)), flags=re.IGNORECASE)
+
+
+def build_filter_matcher(include_terms: List[str], exclude_terms: List[str]) -> Callable[[str], bool]:
+    """
+    Retourne une fonction testant si un texte en minuscules contient au moins un des termes
+    à inclure (s'il y en a) et aucun des termes à exclure : un seul automate d'Aho-Corasick
+    (nécessite pyahocorasick) recherche les deux listes en un seul passage sur le texte.
+    """
+    automaton = ahocorasick.Automaton()
+    for term in include_terms:
+        automaton.add_word(term.lower(), True)
+    # Ajoutés en dernier : un terme présent dans les deux listes reste une exclusion
+    for term in exclude_terms:
+        automaton.add_word(term.lower(), False)
+    automaton.make_automaton()
+
+    def match(text: str) -> bool:
+        included = not include_terms
+        for _, is_include in automaton.iter(text):
+            if not is_include:
+                return False
+            included = True
+        return included
+
+    return match
+
+
+def terms_mask(urls: pd.Series, include_terms: List[str], exclude_terms: List[str]) -> np.ndarray:
+    """
+    Calcule le masque des URLs contenant au moins un des termes à inclure et aucun terme
+    à exclure, sur les URLs en minuscules mises en cache par url_index : un passage vectorisé
+    par terme pour quelques termes ; au-delà de AHOCORASICK_MIN_TERMS termes, un seul passage
+    de l'automate d'Aho-Corasick (si installé) pour les deux listes.
+    """
+    _, lowered_urls = url_index(urls)
+    if not include_terms and not exclude_terms:
+        return np.ones(len(lowered_urls), dtype=bool)
+
+    if ahocorasick is not None and len(include_terms) + len(exclude_terms) >= AHOCORASICK_MIN_TERMS:
+        match = build_filter_matcher(include_terms, exclude_terms)
+        return np.fromiter(map(match, lowered_urls), dtype=bool, count=len(lowered_urls))
+
+    lowered_series = pd.Series(lowered_urls, dtype=object, copy=False)
+    mask = contains_any(lowered_series, include_terms) if include_terms else np.ones(len(lowered_urls), dtype=bool)
+    if exclude_terms:
+        mask &= ~contains_any(lowered_series, exclude_terms)
+    return mask
@@ -14,6 +14,12 @@ def setup_sidebar():
     """Configure la barre latérale avec les paramètres."""
     st.sidebar.header("Paramètres")
     top_n = st.sidebar.slider("Nombre de pages similaires à afficher", 1, 20, 5)
+    quantize = st.sidebar.checkbox(
+        "Recherche approchée (embeddings int8)",
+        value=False,
+        help="Accélère la recherche et réduit la mémoire sur les gros catalogues, au prix d'une légère "
+             "perte de précision (nécessite FAISS)"
+    )
 
     # Configuration des paramètres de filtrage avancé
     st.sidebar.header("Filtres d'URL")
@@ -49,4 +55,4 @@ def setup_sidebar():
         help="Niveau 1: premier dossier, Niveau 2: second dossier, etc."
     )
 
-    return top_n, include_exact, include_partial, exclude_exact, exclude_partial, theme_level
\ No newline at end of file
+    return top_n, quantize, include_exact, include_partial, exclude_exact, exclude_partial, theme_level
\ No newline at end of file
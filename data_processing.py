@@ -1,9 +1,32 @@
+import hashlib
+import io
+import re
+from itertools import chain
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 import streamlit as st
 
+try:
+    import faiss
+except ImportError:  # FAISS est optionnel : repli sur numpy
+    faiss = None
+
+# Mémoire de travail d'un bloc de similarités (l'effectif du bloc en est déduit selon le nombre de pages)
+SIMILARITY_TILE_BYTES = 32 << 20
+
+# Octets par cellule d'un bloc : similarité float32 et indice int64 renvoyé par argpartition
+SIMILARITY_CELL_BYTES = np.dtype(np.float32).itemsize + np.dtype(np.intp).itemsize
+
+# Séparateurs entourant des éléments vides ("[1,,3]", "[1,2,]") : ignorés, comme le faisait l'analyse valeur par valeur
+EMPTY_ELEMENTS_PATTERN = re.compile(r',(?:\s*,)+')
+
+# Nombre de pages à partir duquel la recherche passe par FAISS (si installé)
+FAISS_MIN_ROWS = 100_000
+
+# Colonnes répétitives des inlinks (types, URLs, ancres) converties en catégories pour les agrégations
+INLINK_CATEGORY_COLUMNS = ['Type', 'From', 'To', 'Anchor Text']
+
 
 def read_csv(uploaded_file) -> Optional[pd.DataFrame]:
     """Lit le CSV uploadé."""
@@ -14,19 +37,35 @@ def read_csv(uploaded_file) -> Optional[pd.DataFrame]:
         return None
 
 
+def to_categorical(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Convertit des colonnes texte très répétitives (URLs, ancres) en type catégoriel :
+    les groupby et comparaisons portent alors sur des codes entiers.
+    """
+    for column in columns:
+        df[column] = df[column].astype('category')
+    return df
+
+
 def convert_embeddings(embedding_str: str) -> Optional[np.ndarray]:
-    """Convertit une chaîne d'embeddings en tableau numpy."""
+    """
+    Convertit une chaîne d'embeddings en tableau numpy (float32).
+    Les éléments vides sont ignorés ; une chaîne sans aucune valeur ou partiellement lisible donne None.
+    """
+    if not isinstance(embedding_str, str):
+        return None
+
     try:
-        if isinstance(embedding_str, str):
-            # Nettoyer la chaîne
-            cleaned_str = embedding_str.strip()
-            if cleaned_str.startswith('[') and cleaned_str.endswith(']'):
-                cleaned_str = cleaned_str[1:-1]
+        # Nettoyer la chaîne et retirer les éléments vides (np.fromstring les lirait comme -1)
+        cleaned_str = embedding_str.strip().lstrip('[').rstrip(']')
+        cleaned_str = EMPTY_ELEMENTS_PATTERN.sub(',', cleaned_str).strip(', \t\n')
+
+        # Analyse en C de toutes les valeurs en une seule passe
+        values = np.fromstring(cleaned_str, dtype=np.float32, sep=',')
 
-            # Diviser et convertir en nombres
-            values = [float(x.strip()) for x in cleaned_str.split(',') if x.strip()]
-            if values:
-                return np.array(values)
+        # Rejeter les chaînes partiellement lisibles
+        if values.size and values.size == cleaned_str.count(',') + 1:
+            return values
 
         return None
 
@@ -34,48 +73,291 @@ def convert_embeddings(embedding_str: str) -> Optional[np.ndarray]:
         return None
 
 
-def find_related_pages(df: pd.DataFrame, filtered_urls: list = None, top_n: int = 5) -> Dict[str, List[Dict]]:
+def parse_embeddings(embedding_strs: pd.Series) -> Optional[np.ndarray]:
+    """
+    Convertit la colonne d'embeddings en une matrice contiguë (N, D) float32,
+    alignée sur les lignes du DataFrame. Les éléments vides sont ignorés, comme dans convert_embeddings.
+    Retourne None si un embedding est manquant ou invalide.
+    """
+    # Cellules vides : avec le type 'str' de pandas, infer_dtype renvoie 'string' même en présence de NaN
+    if (not len(embedding_strs) or embedding_strs.isna().any()
+            or pd.api.types.infer_dtype(embedding_strs, skipna=False) != 'string'):
+        return None
+
+    # Nettoyer les chaînes et retirer les éléments vides (np.fromstring les lirait comme -1)
+    cleaned = embedding_strs.str.strip().str.lstrip('[').str.rstrip(']')
+    cleaned = cleaned.str.replace(EMPTY_ELEMENTS_PATTERN.pattern, ',', regex=True).str.strip(', \t\n')
+
+    # Toutes les lignes doivent avoir la même dimension
+    counts = np.fromiter((row.count(',') for row in cleaned), dtype=np.int64, count=len(cleaned)) + 1
+    dimension = counts[0]
+    if (counts != dimension).any():
+        return None
+
+    # Analyse en C de toute la colonne en une seule passe, directement dans la matrice
+    try:
+        values = np.fromstring(','.join(cleaned), dtype=np.float32, sep=',')
+    except ValueError:
+        return None
+
+    if values.size != len(cleaned) * dimension:
+        return None
+
+    return values.reshape(len(cleaned), dimension)
+
+
+@st.cache_resource(show_spinner=False)
+def load_embeddings(file_bytes: bytes) -> Tuple[Optional[pd.DataFrame], Optional[np.ndarray]]:
+    """
+    Lit le CSV d'embeddings et convertit la colonne en matrice (N, D) float32.
+    Mis en cache sur le contenu du fichier : le parsing n'est pas refait à chaque interaction,
+    et le résultat est partagé sans copie entre les exécutions. Il est en lecture seule :
+    la matrice est verrouillée en écriture et le DataFrame ne doit pas être modifié en place.
+
+    Returns:
+        DataFrame sans la colonne Embeddings et matrice alignée, ou (None, None) en cas d'erreur
+    """
+    df = read_csv(io.BytesIO(file_bytes))
+    if df is None:
+        return None, None
+
+    # Vérification des colonnes
+    if not all(col in df.columns for col in ['URL', 'Embeddings']):
+        st.error("Le fichier d'embeddings doit contenir les colonnes : URL, Embeddings")
+        return None, None
+
+    embeddings = parse_embeddings(df['Embeddings'])
+    if embeddings is None:
+        st.error("Certains embeddings n'ont pas pu être convertis.")
+        return None, None
+
+    embeddings.flags.writeable = False
+    return df.drop(columns='Embeddings'), embeddings
+
+
+@st.cache_resource(show_spinner=False)
+def load_inlinks(file_bytes: bytes) -> Tuple[Optional[pd.DataFrame], str]:
+    """
+    Lit le CSV d'inlinks et convertit ses colonnes répétitives en catégories.
+    Mis en cache sur le contenu du fichier et partagé sans copie entre les exécutions :
+    le DataFrame est en lecture seule. L'empreinte du fichier, calculée une fois par upload,
+    identifie les résultats mémorisés dans la session.
+
+    Returns:
+        DataFrame des inlinks (None en cas d'erreur de lecture) et empreinte du fichier
+    """
+    fingerprint = hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+    inlinks_df = read_csv(io.BytesIO(file_bytes))
+    if inlinks_df is None:
+        return None, fingerprint
+
+    columns = [column for column in INLINK_CATEGORY_COLUMNS if column in inlinks_df.columns]
+    return to_categorical(inlinks_df, columns), fingerprint
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """Normalise les lignes (norme L2) : le produit scalaire devient la similarité cosinus."""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return np.ascontiguousarray(embeddings / norms, dtype=np.float32)
+
+
+def _top_k_numpy(normalized: np.ndarray, query_indices: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Recherche exacte des k voisins par blocs de produits matriciels float32,
+    le nombre de lignes d'un bloc étant borné par SIMILARITY_TILE_BYTES.
+    """
+    indices = np.empty((len(query_indices), k), dtype=np.int64)
+    scores = np.empty((len(query_indices), k), dtype=np.float32)
+    tile_rows = max(1, SIMILARITY_TILE_BYTES // (SIMILARITY_CELL_BYTES * len(normalized)))
+
+    for start in range(0, len(query_indices), tile_rows):
+        rows = query_indices[start:start + tile_rows]
+        similarities = normalized[rows] @ normalized.T
+
+        # Sélection partielle des k meilleurs (en fin de ligne, sans copie négative) puis tri de ces seuls candidats
+        top = np.argpartition(similarities, -k, axis=1)[:, -k:]
+        top_scores = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+
+        indices[start:start + len(rows)] = np.take_along_axis(top, order, axis=1)
+        scores[start:start + len(rows)] = np.take_along_axis(top_scores, order, axis=1)
+
+    return indices, scores
+
+
+def _top_k_faiss(normalized: np.ndarray, query_indices: np.ndarray, k: int,
+                 quantize: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Recherche des k voisins avec un index FAISS : exacte (GPU si disponible),
+    ou approchée sur des embeddings quantifiés en int8 si quantize est vrai.
+    """
+    dimension = normalized.shape[1]
+    if quantize:
+        # Codes sur 8 bits : 4 fois moins de mémoire que float32, produits scalaires approchés
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(normalized)
+    else:
+        index = faiss.IndexFlatIP(dimension)
+        if hasattr(faiss, 'get_num_gpus') and faiss.get_num_gpus() > 0:
+            index = faiss.index_cpu_to_gpu(faiss.StandardGpuResources(), 0, index)
+    index.add(normalized)
+
+    scores, indices = index.search(normalized[query_indices], k)
+    return indices, scores
+
+
+def _top_k_similar(embeddings: np.ndarray, query_indices: np.ndarray, k: int,
+                   quantize: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcule les k voisins les plus proches (cosinus) des lignes demandées.
+    Retourne les indices et les scores triés par score décroissant.
+    La quantification int8 n'est disponible qu'avec FAISS ; sans lui, la recherche reste exacte.
+    """
+    normalized = _normalize(embeddings)
+    k = min(k, len(normalized))
+
+    if faiss is not None and (quantize or len(normalized) >= FAISS_MIN_ROWS):
+        return _top_k_faiss(normalized, query_indices, k, quantize)
+
+    return _top_k_numpy(normalized, query_indices, k)
+
+
+@st.cache_data(show_spinner=False)
+def find_related_pages(df: pd.DataFrame, embeddings: np.ndarray, filtered_urls: list = None,
+                       top_n: int = 5, quantize: bool = False) -> Dict[str, List[Dict]]:
     """
     Trouve les pages les plus similaires pour chaque URL.
+    embeddings: matrice (N, D) des embeddings, alignée sur les lignes de df
     filtered_urls: liste des URLs sources à analyser (si None, analyse toutes les URLs)
+    quantize: recherche approchée sur des embeddings quantifiés en int8 (nécessite FAISS)
+    Mis en cache : les sliders de score n'entraînent pas de nouvelle recherche.
     """
     related_pages = {}
     try:
-        # Calculer la matrice de similarité sur toutes les données
-        embeddings = np.stack(df['Embeddings'].values)
-        cosine_similarities = cosine_similarity(embeddings)
+        urls = df['URL'].to_numpy()
 
         # Créer un dictionnaire d'index pour les URLs
-        url_to_idx = {url: idx for idx, url in enumerate(df['URL'])}
+        url_to_idx = {url: idx for idx, url in enumerate(urls)}
 
         # Utiliser toutes les URLs si aucun filtre n'est spécifié
-        urls_to_process = filtered_urls if filtered_urls else df['URL'].tolist()
+        urls_to_process = filtered_urls if filtered_urls else urls.tolist()
+        query_indices = np.fromiter((url_to_idx[url] for url in urls_to_process), dtype=np.int64,
+                                    count=len(urls_to_process))
 
-        for url in urls_to_process:
-            idx = url_to_idx[url]
-            # Récupérer les indices des pages les plus similaires (exclure l'URL elle-même)
-            similarities = cosine_similarities[idx]
-            similar_indices = np.argsort(similarities)[::-1][1:top_n + 1]  # +1 car on exclut l'URL elle-même
+        # +1 car on exclut l'URL elle-même
+        similar_indices, similar_scores = _top_k_similar(embeddings, query_indices, top_n + 1, quantize)
 
+        for url, idx, indices, scores in zip(urls_to_process, query_indices,
+                                             similar_indices.tolist(), similar_scores.tolist()):
             similar_pages = []
-            for similar_idx in similar_indices:
+            for similar_idx, score in zip(indices, scores):
+                if similar_idx == idx:
+                    continue
                 similar_pages.append({
-                    'url': df.iloc[similar_idx]['URL'],
-                    'score': similarities[similar_idx]
+                    'url': urls[similar_idx],
+                    'score': score
                 })
 
-            related_pages[url] = similar_pages
+            related_pages[url] = similar_pages[:top_n]
 
     except Exception as e:
         st.error(f"Erreur lors du calcul des similarités : {str(e)}")
-        return {}
+        return FingerprintedDict({})
+
+    return FingerprintedDict(related_pages)
+
+
+def relations_to_arrays(related_pages: Dict[str, List[Dict]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Aplatit related_pages en trois tableaux parallèles : URLs sources, URLs cibles, scores (float32).
+    """
+    counts = np.fromiter((len(pages) for pages in related_pages.values()), dtype=np.int64,
+                         count=len(related_pages))
+    total = int(counts.sum())
+
+    sources = np.repeat(np.array(list(related_pages.keys()), dtype=object), counts)
+    targets = np.fromiter((page['url'] for pages in related_pages.values() for page in pages),
+                          dtype=object, count=total)
+    scores = np.fromiter((page['score'] for pages in related_pages.values() for page in pages),
+                         dtype=np.float32, count=total)
+
+    return sources, targets, scores
+
+
+def links_to_arrays(existing_links: Dict[str, Set[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aplatit les liens existants en deux tableaux parallèles : URLs sources, URLs cibles.
+    """
+    counts = np.fromiter((len(targets) for targets in existing_links.values()), dtype=np.int64,
+                         count=len(existing_links))
+
+    sources = np.repeat(np.array(list(existing_links.keys()), dtype=object), counts)
+    targets = np.fromiter(chain.from_iterable(existing_links.values()), dtype=object, count=int(counts.sum()))
+
+    return sources, targets
+
+
+def relations_to_frame(related_pages: Dict[str, List[Dict]]) -> pd.DataFrame:
+    """
+    Représente related_pages sous forme de table (source, target, score),
+    une relation par ligne, pour les filtrages et agrégations vectorisés.
+    """
+    sources, targets, scores = relations_to_arrays(related_pages)
+    return pd.DataFrame({'source': sources, 'target': targets, 'score': scores})
+
+
+def fingerprint_mapping(mapping: Dict) -> int:
+    """
+    Empreinte d'un dictionnaire de pages similaires ({url: [{'url', 'score'}]}) ou de liens
+    existants ({url: {urls}}), obtenue par hachage vectorisé de sa forme aplatie.
+    L'empreinte dépend de l'ordre des clés et des valeurs, et des clés associées à une liste vide.
+    """
+    keys = np.array(list(mapping.keys()), dtype=object)
+    counts = np.fromiter(map(len, mapping.values()), dtype=np.int64, count=len(mapping))
+
+    first_value = next(iter(mapping.values()), None)
+    if isinstance(first_value, (set, frozenset)):
+        flat = pd.DataFrame({
+            'source': np.repeat(keys, counts),
+            'target': np.fromiter(chain.from_iterable(mapping.values()), dtype=object, count=int(counts.sum()))
+        })
+    else:
+        sources, targets, scores = relations_to_arrays(mapping)
+        flat = pd.DataFrame({'source': sources, 'target': targets, 'score': scores})
+
+    # Hachage ligne par ligne avec la position (index), puis empreinte de la séquence des hachages
+    digest = hashlib.blake2b(digest_size=8)
+    for frame in (pd.DataFrame({'key': keys, 'count': counts}), flat):
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+
+    return int.from_bytes(digest.digest(), 'little')
+
+
+class FingerprintedDict(dict):
+    """
+    Dictionnaire de pages similaires ou de liens existants accompagné de son empreinte,
+    calculée une seule fois à la construction. Il ne doit plus être modifié ensuite.
+    """
+
+    def __init__(self, mapping: Dict):
+        super().__init__(mapping)
+        self.fingerprint = fingerprint_mapping(self)
 
-    return related_pages
 
+# Fonctions de hachage des clés de cache : les relations et liens existants sont hachés par leur
+# empreinte, sans que Streamlit ne parcoure chaque élément ; les autres dictionnaires gardent
+# le hachage par défaut
+CACHE_HASH_FUNCS = {FingerprintedDict: lambda mapping: mapping.fingerprint, frozenset: hash}
 
+
+@st.cache_data(show_spinner=False, hash_funcs=CACHE_HASH_FUNCS)
 def analyze_themes(df: pd.DataFrame, related_pages: Dict[str, List[Dict]],
                    min_score: float = 0.5, theme_level: int = 1) -> pd.DataFrame:
-    """Analyse et regroupe les pages par thématique avec analyse inter-thématiques."""
+    """
+    Analyse et regroupe les pages par thématique avec analyse inter-thématiques.
+    Mis en cache : seuls le score minimum et le niveau de thème relancent l'analyse.
+    """
     from utils import extract_theme_from_url
 
     theme_data = []
@@ -9,6 +9,16 @@ def clean_terms(terms_str: str) -> List[str]:
     return []
 
 
+def build_filter_pattern(include_patterns: List[str], exclude_patterns: List[str]) -> str:
+    """
+    Combine les filtres en une seule expression régulière :
+    un lookahead positif par inclusion (ET) et un lookahead négatif par exclusion.
+    """
+    includes = ''.join(f"(?=.*(?:{pattern}))" for pattern in include_patterns)
+    excludes = ''.join(f"(?!.*(?:{pattern}))" for pattern in exclude_patterns)
+    return f"^{includes}{excludes}"
+
+
 def apply_url_filters(df: pd.DataFrame,
                       include_exact: str,
                       include_partial: str,
@@ -17,35 +27,15 @@ def apply_url_filters(df: pd.DataFrame,
     """
     Applique les filtres d'URL et retourne le DataFrame filtré et la liste des URLs filtrées.
     """
-    filtered_df = df.copy()
-    filtered_urls = None
-
-    # Application des filtres d'inclusion exacts
-    include_exact_terms = clean_terms(include_exact)
-    if include_exact_terms:
-        for term in include_exact_terms:
-            filtered_df = filtered_df[filtered_df['URL'].str.contains(f"/{term}/", case=False)]
-        filtered_urls = filtered_df['URL'].tolist()
-
-    # Application des filtres d'inclusion partiels
-    include_partial_terms = clean_terms(include_partial)
-    if include_partial_terms:
-        for term in include_partial_terms:
-            filtered_df = filtered_df[filtered_df['URL'].str.contains(term, case=False)]
-        filtered_urls = filtered_df['URL'].tolist()
-
-    # Application des filtres d'exclusion exacts
-    exclude_exact_terms = clean_terms(exclude_exact)
-    if exclude_exact_terms:
-        for term in exclude_exact_terms:
-            filtered_df = filtered_df[~filtered_df['URL'].str.contains(f"/{term}/", case=False)]
-        filtered_urls = filtered_df['URL'].tolist()
-
-    # Application des filtres d'exclusion partiels
-    exclude_partial_terms = clean_terms(exclude_partial)
-    if exclude_partial_terms:
-        for term in exclude_partial_terms:
-            filtered_df = filtered_df[~filtered_df['URL'].str.contains(term, case=False)]
-        filtered_urls = filtered_df['URL'].tolist()
-
-    return filtered_df, filtered_urls
\ No newline at end of file
+    # Les filtres exacts portent sur un segment complet du chemin
+    include_patterns = [f"/{term}/" for term in clean_terms(include_exact)] + clean_terms(include_partial)
+    exclude_patterns = [f"/{term}/" for term in clean_terms(exclude_exact)] + clean_terms(exclude_partial)
+
+    if not include_patterns and not exclude_patterns:
+        return df.copy(), None
+
+    # Un seul passage sur la colonne URL pour l'ensemble des filtres
+    pattern = build_filter_pattern(include_patterns, exclude_patterns)
+    filtered_df = df[df['URL'].str.contains(pattern, case=False)]
+
+    return filtered_df, filtered_df['URL'].tolist()
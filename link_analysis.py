@@ -1,136 +1,187 @@
 import pandas as pd
-from typing import Dict, List, Set
+import numpy as np
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Set, Tuple
 import streamlit as st
+from data_processing import relations_to_frame, FingerprintedDict, CACHE_HASH_FUNCS
 
+# Types d'opportunités, indexés par l'existence du lien inverse
+OPPORTUNITY_TYPES = ['Lien manquant bidirectionnel', 'Lien manquant unidirectionnel']
 
-def process_inlinks(inlinks_df: pd.DataFrame) -> Dict[str, Set[str]]:
+
+@st.cache_resource(show_spinner=False)
+def process_inlinks(inlinks_df: pd.DataFrame) -> Tuple[FingerprintedDict, FrozenSet[Tuple[str, str]]]:
     """
     Traite le fichier d'inlinks pour créer un dictionnaire des liens existants.
     Ne garde que les hyperlinks et exclut les self-referencing.
+    Mis en cache et partagé sans copie entre les exécutions : le résultat est en lecture seule.
+
+    Returns:
+        Tuple contenant le dictionnaire des liens existants et l'ensemble des paires (source, cible)
     """
-    # Filtrer les hyperlinks uniquement
-    hyperlinks = inlinks_df[inlinks_df['Type'] == 'Hyperlink']
+    from_urls = inlinks_df['From'].to_numpy()
+    to_urls = inlinks_df['To'].to_numpy()
+
+    # Filtrer les hyperlinks uniquement et exclure les self-referencing, en un seul masque
+    # (sur une colonne catégorielle, la comparaison au type porte sur les codes)
+    mask = (inlinks_df['Type'] == 'Hyperlink').to_numpy() & (from_urls != to_urls)
+    hyperlinks = pd.DataFrame({'From': from_urls[mask], 'To': to_urls[mask]})
 
     # Créer un dictionnaire des liens existants
-    existing_links = {}
+    existing_links = FingerprintedDict(hyperlinks.groupby('From', sort=False)['To'].agg(set).to_dict())
+
+    # Paires (source, cible) calculées une seule fois pour toutes les analyses
+    existing_pairs = frozenset(zip(from_urls[mask], to_urls[mask]))
 
-    for _, row in hyperlinks.iterrows():
-        from_url = row['From']
-        to_url = row['To']
+    return existing_links, existing_pairs
 
-        # Exclure les self-referencing
-        if from_url != to_url:
-            if from_url not in existing_links:
-                existing_links[from_url] = set()
-            existing_links[from_url].add(to_url)
 
-    return existing_links
+@st.cache_resource(show_spinner=False, hash_funcs=CACHE_HASH_FUNCS)
+def intern_links(existing_links: Dict[str, Set[str]]) -> Tuple[Mapping[str, int], FrozenSet[Tuple[int, int]]]:
+    """
+    Attribue un identifiant entier à chaque URL et représente les liens existants
+    par un ensemble figé de paires (source, cible) d'identifiants.
+    Mis en cache et partagé sans copie entre les exécutions : le résultat est en lecture seule.
+
+    Returns:
+        Tuple contenant le dictionnaire URL -> identifiant et l'ensemble des liens
+    """
+    url_ids = {}
+    for source_url, targets in existing_links.items():
+        url_ids.setdefault(source_url, len(url_ids))
+        for target_url in targets:
+            url_ids.setdefault(target_url, len(url_ids))
+
+    links = frozenset((url_ids[source_url], url_ids[target_url])
+                      for source_url, targets in existing_links.items() for target_url in targets)
+
+    return MappingProxyType(url_ids), links
+
+
+def build_existing_pairs(existing_links: Dict[str, Set[str]]) -> FrozenSet[Tuple[str, str]]:
+    """
+    Aplatit les liens existants en un ensemble de paires (source, cible).
+    """
+    return frozenset((source_url, target_url)
+                     for source_url, target_urls in existing_links.items() for target_url in target_urls)
+
+
+def links_exist(sources: pd.Series, targets: pd.Series, existing_pairs: FrozenSet[Tuple[str, str]]) -> np.ndarray:
+    """
+    Indique pour chaque paire (source, cible) si le lien existe déjà.
+    """
+    return np.fromiter(map(existing_pairs.__contains__, zip(sources, targets)), dtype=bool, count=len(sources))
+
+
+@st.cache_data(show_spinner=False, hash_funcs=CACHE_HASH_FUNCS)
+def _rank_linking_opportunities(semantic_relations: Dict[str, List[Dict]],
+                                existing_links: Dict[str, Set[str]],
+                                filtered_urls: List[str] = None,
+                                existing_pairs: FrozenSet[Tuple[str, str]] = None) -> pd.DataFrame:
+    """
+    Construit toutes les opportunités de maillage, triées par score décroissant.
+    Mis en cache : indépendant du score minimum, le tri n'est fait qu'une fois.
+    """
+    relations = relations_to_frame(semantic_relations)
+
+    # Exclure le self-referencing
+    mask = relations['source'] != relations['target']
+
+    # Restreindre aux URLs sources à analyser
+    if filtered_urls:
+        mask &= relations['source'].isin(filtered_urls)
+
+    relations = relations[mask]
+
+    # Vérifier si le lien n'existe pas déjà (anti-jointure), puis la réciprocité du lien
+    if existing_pairs is None:
+        existing_pairs = build_existing_pairs(existing_links)
+    relations = relations[~links_exist(relations['source'], relations['target'], existing_pairs)]
+    has_reverse = links_exist(relations['target'], relations['source'], existing_pairs)
+
+    # Créer et trier le DataFrame des opportunités (tri stable), colonne par colonne :
+    # le type est stocké sous forme de codes plutôt que d'une chaîne par ligne
+    opportunities_df = pd.DataFrame({
+        'Source URL': relations['source'].to_numpy(),
+        'Target URL': relations['target'].to_numpy(),
+        'Score de similarité': relations['score'].to_numpy(),
+        'Type': pd.Categorical.from_codes(has_reverse.astype(np.int8), categories=OPPORTUNITY_TYPES)
+    })
+    return opportunities_df.sort_values('Score de similarité', ascending=False, kind='mergesort')
 
 
 def find_linking_opportunities(semantic_relations: Dict[str, List[Dict]],
                                existing_links: Dict[str, Set[str]],
                                min_score: float = 0.7,
-                               filtered_urls: List[str] = None) -> pd.DataFrame:
+                               filtered_urls: List[str] = None,
+                               existing_pairs: FrozenSet[Tuple[str, str]] = None) -> pd.DataFrame:
     """
     Identifie les opportunités de maillage interne en comparant
     les relations sémantiques avec les liens existants.
 
     filtered_urls: Liste des URLs sources à analyser (si None, analyse toutes les URLs)
+    existing_pairs: Paires (source, cible) des liens existants (si None, calculées depuis existing_links)
     """
-    opportunities = []
-
-    # Déterminer les URLs sources à analyser
-    source_urls = filtered_urls if filtered_urls else semantic_relations.keys()
-
-    for source_url in source_urls:
-        if source_url not in semantic_relations:
-            continue
-
-        source_links = existing_links.get(source_url, set())
-        similar_pages = semantic_relations[source_url]
-
-        for page in similar_pages:
-            target_url = page['url']
-            score = page['score']
-
-            # Ne considérer que les pages avec un score supérieur au minimum
-            if score >= min_score and target_url != source_url:
-                # Vérifier si le lien n'existe pas déjà
-                if target_url not in source_links:
-                    # Vérifier la réciprocité du lien
-                    target_links = existing_links.get(target_url, set())
-                    is_bidirectional = source_url not in target_links
-
-                    opportunities.append({
-                        'Source URL': source_url,
-                        'Target URL': target_url,
-                        'Score de similarité': score,
-                        'Type': 'Lien manquant bidirectionnel' if is_bidirectional
-                        else 'Lien manquant unidirectionnel'
-                    })
-
-    # Créer et trier le DataFrame des opportunités
-    if opportunities:
-        opportunities_df = pd.DataFrame(opportunities)
-        return opportunities_df.sort_values('Score de similarité', ascending=False)
-    else:
-        return pd.DataFrame(columns=['Source URL', 'Target URL', 'Score de similarité', 'Type'])
+    ranked = _rank_linking_opportunities(semantic_relations, existing_links, filtered_urls, existing_pairs)
+
+    # Opportunités triées par score décroissant : le score minimum en sélectionne un préfixe
+    end = np.searchsorted(-ranked['Score de similarité'].to_numpy(), -min_score, side='right')
+    return ranked.iloc[:end]
+
 
+def _count_by_url(urls: pd.Categorical, values) -> np.ndarray:
+    """
+    Compte les occurrences de chaque URL de urls parmi values (les autres valeurs sont ignorées).
+    """
+    codes = urls.categories.get_indexer(values)
+    counts = np.bincount(codes[codes >= 0], minlength=len(urls.categories))
+    return counts[urls.codes]
 
+
+@st.cache_data(show_spinner=False, hash_funcs=CACHE_HASH_FUNCS)
 def analyze_incoming_links(existing_links: Dict[str, Set[str]],
                            semantic_relations: Dict[str, List[Dict]],
                            all_urls: List[str],
-                           min_score: float = 0.7) -> pd.DataFrame:
+                           min_score: float = 0.7,
+                           existing_pairs: FrozenSet[Tuple[str, str]] = None) -> pd.DataFrame:
     """
     Analyse les liens entrants et le potentiel de maillage pour chaque page.
+    Mis en cache par score minimum : un slider déjà visité ne refait pas l'analyse.
 
     Returns:
         DataFrame avec URL, nombre de liens reçus et nombre de liens recommandés
     """
-    # Calculer les liens entrants pour chaque URL
-    incoming_links = {}
-    for url in all_urls:
-        incoming_links[url] = 0
+    # Coder chaque URL par un entier pour compter en une seule passe avec np.bincount
+    urls = pd.Categorical(all_urls)
 
     # Compter les liens entrants existants
-    for source, targets in existing_links.items():
-        for target in targets:
-            if target in incoming_links:
-                incoming_links[target] += 1
-
-    # Calculer les opportunités de liens pour chaque URL
-    recommended_links = {}
-    for url in all_urls:
-        recommended_links[url] = 0
-
-    # Parcourir toutes les relations sémantiques
-    for source_url, similar_pages in semantic_relations.items():
-        for page in similar_pages:
-            target_url = page['url']
-            score = page['score']
-
-            if score >= min_score:
-                # Vérifier si le lien n'existe pas déjà dans les deux directions
-                if target_url not in existing_links.get(source_url, set()):
-                    recommended_links[target_url] += 1  # Lien entrant recommandé
-                if source_url not in existing_links.get(target_url, set()):
-                    recommended_links[source_url] += 1  # Lien sortant recommandé
-
-    # Créer le DataFrame
-    analysis_data = []
-    for url in all_urls:
-        analysis_data.append({
-            'URL': url,
-            'Nombre de liens internes reçus': incoming_links[url],
-            'Nombre de liens internes recommandés': recommended_links[url]
-        })
+    existing_targets = [target for targets in existing_links.values() for target in targets]
+    incoming_links = _count_by_url(urls, existing_targets)
+
+    # Ne considérer que les relations sémantiques au-dessus du score minimum
+    relations = relations_to_frame(semantic_relations)
+    relations = relations[relations['score'] >= min_score]
+
+    # Vérifier si le lien n'existe pas déjà dans les deux directions
+    if existing_pairs is None:
+        existing_pairs = build_existing_pairs(existing_links)
+    missing_forward = ~links_exist(relations['source'], relations['target'], existing_pairs)
+    missing_backward = ~links_exist(relations['target'], relations['source'], existing_pairs)
+
+    # Liens entrants recommandés sur la cible, liens sortants recommandés sur la source
+    recommended_links = _count_by_url(urls, np.concatenate([relations['target'].to_numpy()[missing_forward],
+                                                            relations['source'].to_numpy()[missing_backward]]))
 
     # Créer et trier le DataFrame
-    df = pd.DataFrame(analysis_data)
+    df = pd.DataFrame({
+        'URL': all_urls,
+        'Nombre de liens internes reçus': incoming_links,
+        'Nombre de liens internes recommandés': recommended_links
+    })
     # Trier d'abord par nombre de liens reçus (croissant)
-    # puis par nombre de liens recommandés (décroissant)
-    return df.sort_values(['Nombre de liens internes reçus', 'Nombre de liens internes recommandés'],
-                          ascending=[True, False])
+    # puis par nombre de liens recommandés (décroissant), par un tri stable sur les comptes entiers
+    order = np.lexsort((-recommended_links, incoming_links))
+    return df.take(order)
 
 
 def analyze_linking_structure(df: pd.DataFrame, existing_links: Dict[str, Set[str]]) -> Dict:
@@ -146,7 +197,7 @@ def analyze_linking_structure(df: pd.DataFrame, existing_links: Dict[str, Set[st
 
     # Calculer les pages orphelines
     if df is not None and existing_links:
-        orphan_pages = len(df[~df['URL'].isin(existing_links.keys())])
+        orphan_pages = len(set(df['URL'].tolist()) - existing_links.keys())
     else:
         orphan_pages = 0
 
@@ -155,12 +206,15 @@ def analyze_linking_structure(df: pd.DataFrame, existing_links: Dict[str, Set[st
         'pages_with_links': pages_with_links,
         'total_links': total_links,
         'avg_links_per_page': avg_links_per_page,
-        'orphan_pages': orphan_pages
+        'orphan_pages': orphan_pages,
+        # Pourcentage calculé ici pour éviter la division par zéro à l'affichage
+        'pct_orphan': (orphan_pages / total_pages * 100) if total_pages > 0 else 0.0
     }
 
     return stats
 
 
+@st.cache_data(show_spinner=False, hash_funcs=CACHE_HASH_FUNCS)
 def analyze_link_distribution(existing_links: Dict[str, Set[str]]) -> pd.DataFrame:
     """
     Analyse la distribution des liens par page.
@@ -168,7 +222,9 @@ def analyze_link_distribution(existing_links: Dict[str, Set[str]]) -> pd.DataFra
     if not existing_links:
         return pd.DataFrame(columns=['URL', 'Nombre de liens sortants'])
 
-    link_counts = {url: len(links) for url, links in existing_links.items()}
-    return pd.DataFrame(list(link_counts.items()),
-                        columns=['URL', 'Nombre de liens sortants']) \
-        .sort_values('Nombre de liens sortants', ascending=False)
\ No newline at end of file
+    # Colonnes construites directement (comptes en int32), sans dictionnaire intermédiaire
+    return pd.DataFrame({
+        'URL': np.fromiter(existing_links.keys(), dtype=object, count=len(existing_links)),
+        'Nombre de liens sortants': np.fromiter(map(len, existing_links.values()), dtype=np.int32,
+                                                count=len(existing_links))
+    }).sort_values('Nombre de liens sortants', ascending=False, kind='mergesort')
\ No newline at end of file
@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 import os
 
-from data_processing import read_csv, convert_embeddings, find_related_pages, analyze_themes
+from data_processing import load_embeddings, load_inlinks, find_related_pages, analyze_themes
 from visualization import create_similarity_network, create_theme_heatmap
 from link_analysis import process_inlinks, find_linking_opportunities, analyze_linking_structure, analyze_incoming_links
 from advanced_link_analysis import (
@@ -11,7 +11,7 @@ from advanced_link_analysis import (
     analyze_anchor_distribution,
     create_anchor_distribution_chart
 )
-from utils import get_download_link
+from utils import get_csv_bytes
 from config import setup_page, setup_sidebar
 from ui_components import display_theme_analysis, display_link_analysis, display_link_recommendations, \
     display_similarity_details
@@ -33,19 +33,21 @@ def main():
                                             key="inlinks")
 
     if uploaded_embeddings is not None:
-        df = read_csv(uploaded_embeddings)
-        inlinks_df = read_csv(uploaded_inlinks) if uploaded_inlinks is not None else None
+        # Lecture et conversion des embeddings, mises en cache sur le contenu du fichier et partagées
+        # sans copie entre les exécutions : df et embeddings sont en lecture seule
+        df, embeddings = load_embeddings(uploaded_embeddings.getvalue())
+        inlinks_df = None
+        if uploaded_inlinks is not None:
+            # Lecture mise en cache de la même façon ; l'empreinte du fichier identifie l'upload
+            # pour les analyses mémorisées dans la session
+            inlinks_df, inlinks_fingerprint = load_inlinks(uploaded_inlinks.getvalue())
+            st.session_state['inlinks_fingerprint'] = inlinks_fingerprint
 
         if df is not None:
             try:
-                # Vérification des colonnes
-                required_columns = ['URL', 'Embeddings']
-                if not all(col in df.columns for col in required_columns):
-                    st.error(f"Le fichier d'embeddings doit contenir les colonnes : URL, Embeddings")
-                    return
-
                 # Configuration des paramètres
-                top_n, include_exact, include_partial, exclude_exact, exclude_partial, theme_level = setup_sidebar()
+                top_n, quantize, include_exact, include_partial, exclude_exact, exclude_partial, theme_level = \
+                    setup_sidebar()
 
                 # Application des filtres
                 filtered_df, filtered_urls = apply_url_filters(
@@ -55,18 +57,12 @@ def main():
                 if filtered_urls:
                     st.sidebar.info(f"Pages après filtrage : {len(filtered_urls)} / {len(df)}")
 
-                # Conversion des embeddings
-                df['Embeddings'] = df['Embeddings'].apply(convert_embeddings)
-
-                if df['Embeddings'].isna().any():
-                    st.error("Certains embeddings n'ont pas pu être convertis.")
-                    return
-
                 # Calcul des pages similaires
-                related_pages = find_related_pages(df, filtered_urls, top_n=top_n)
+                related_pages = find_related_pages(df, embeddings, filtered_urls, top_n=top_n, quantize=quantize)
 
                 # Traitement des inlinks si disponibles
                 existing_links = {}
+                existing_pairs = frozenset()
                 if inlinks_df is not None:
                     # Vérifier les colonnes nécessaires pour le fichier d'inlinks
                     required_inlink_columns = ['Type', 'From', 'To', 'Status Code', 'Anchor Text']
@@ -76,7 +72,7 @@ def main():
                         return
 
                     # Traitement des liens existants
-                    existing_links = process_inlinks(inlinks_df)
+                    existing_links, existing_pairs = process_inlinks(inlinks_df)
 
                 # Table détaillée des similarités
                 st.header("Table détaillée des similarités")
@@ -90,13 +86,14 @@ def main():
                 )
 
                 # Afficher les similarités avec les liens existants si disponibles
-                similarity_df = display_similarity_details(related_pages, similarity_min_score, existing_links)
+                similarity_df = display_similarity_details(related_pages, similarity_min_score, existing_links,
+                                                           existing_pairs)
 
                 # Bouton d'export pour la table de similarité
                 if not similarity_df.empty:
                     st.download_button(
                         label="Télécharger la table des similarités (CSV)",
-                        data=similarity_df.to_csv(index=False).encode('utf-8'),
+                        data=get_csv_bytes(similarity_df),
                         file_name="similarites_detaillees.csv",
                         mime="text/csv",
                         key="download_similarities"
@@ -127,7 +124,13 @@ def main():
                 display_theme_analysis(theme_df, min_cluster_size)
 
                 # Export des résultats thématiques avec une clé unique
-                st.markdown(get_download_link(theme_df, "theme_results"), unsafe_allow_html=True)
+                st.download_button(
+                    label="Télécharger les résultats (CSV)",
+                    data=get_csv_bytes(theme_df),
+                    file_name="resultats.csv",
+                    mime="text/csv",
+                    key="download_theme_results"
+                )
 
                 if inlinks_df is not None:
                     st.header("Analyse du maillage interne")
@@ -142,7 +145,8 @@ def main():
                         existing_links,
                         related_pages,
                         df['URL'].tolist(),
-                        min_score=similarity_min_score
+                        min_score=similarity_min_score,
+                        existing_pairs=existing_pairs
                     )
 
                     display_link_recommendations(link_analysis_df)
@@ -153,7 +157,8 @@ def main():
                         related_pages,
                         existing_links,
                         min_score=similarity_min_score,
-                        filtered_urls=filtered_urls
+                        filtered_urls=filtered_urls,
+                        existing_pairs=existing_pairs
                     )
 
                     if not opportunities.empty:
@@ -172,7 +177,13 @@ def main():
                         )
 
                         # Export des opportunités avec une clé unique
-                        st.markdown(get_download_link(opportunities, "opportunities"), unsafe_allow_html=True)
+                        st.download_button(
+                            label="Télécharger les résultats (CSV)",
+                            data=get_csv_bytes(opportunities),
+                            file_name="resultats.csv",
+                            mime="text/csv",
+                            key="download_opportunities"
+                        )
 
                     # Analyse avancée du maillage interne
                     broken_links_count, broken_links_df = analyze_broken_links(inlinks_df)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import advanced_link_analysis
+from advanced_link_analysis import filter_url_series, index_similar_sources, terms_mask, url_index
+
+URLS = pd.Series([
+    'https://example.com/Blog/seo-tips',
+    'https://example.com/blog/archive',
+    'https://example.com/shop/product-1',
+    'https://example.com/shop/product-22',
+    'https://example.com/about',
+], dtype='string[pyarrow]')
+
+
+def naive_terms_mask(urls, include_terms, exclude_terms):
+    lowered = [url.lower() for url in urls]
+    return np.array([
+        (not include_terms or any(term.lower() in url for term in include_terms))
+        and not any(term.lower() in url for term in exclude_terms)
+        for url in lowered
+    ])
+
+
+def test_url_index_is_read_only():
+    url_values, lowered_urls = url_index(URLS)
+    assert url_values.dtype == object and lowered_urls.dtype == object
+    assert lowered_urls[0] == 'https://example.com/blog/seo-tips'
+    assert not url_values.flags.writeable and not lowered_urls.flags.writeable
+
+
+def test_index_similar_sources_is_read_only():
+    similar_sources = index_similar_sources({
+        'https://a/x': [{'url': 'https://a/z', 'score': 0.75}],
+        'https://a/y': [{'url': 'https://a/z', 'score': 0.5}, {'url': 'https://a/x', 'score': 0.25}],
+    })
+    assert dict(similar_sources) == {
+        'https://a/z': (('https://a/x', 0.75), ('https://a/y', 0.5)),
+        'https://a/x': (('https://a/y', 0.25),),
+    }
+    with pytest.raises(TypeError):
+        similar_sources['https://a/w'] = ()
+
+
+@pytest.mark.parametrize('min_terms, automaton', [
+    (advanced_link_analysis.AHOCORASICK_MIN_TERMS, advanced_link_analysis.ahocorasick),
+    (1, advanced_link_analysis.ahocorasick),
+    (1, None),
+])
+@pytest.mark.parametrize('include_terms, exclude_terms', [
+    ([], []),
+    (['BLOG'], []),
+    ([], ['shop']),
+    (['blog', 'product'], ['archive', '-22']),
+    (['shop'], ['shop']),
+    (['a.B'], ['(']),
+])
+def test_terms_mask_matches_naive_filter(monkeypatch, min_terms, automaton, include_terms, exclude_terms):
+    monkeypatch.setattr(advanced_link_analysis, 'AHOCORASICK_MIN_TERMS', min_terms)
+    monkeypatch.setattr(advanced_link_analysis, 'ahocorasick', automaton)
+    mask = terms_mask(URLS, include_terms, exclude_terms)
+    assert mask.tolist() == naive_terms_mask(URLS, include_terms, exclude_terms).tolist()
+
+
+def test_filter_url_series_combines_substrings_and_regex():
+    assert filter_url_series(URLS, 'SHOP', '-22') == ['https://example.com/shop/product-1']
+    assert filter_url_series(URLS, regex_pattern=r'product-\d$') == ['https://example.com/shop/product-1']
+    assert filter_url_series(URLS, 'blog', regex_pattern='(seo|about)') == ['https://example.com/Blog/seo-tips']
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_processing
+from data_processing import (CACHE_HASH_FUNCS, FingerprintedDict, convert_embeddings, fingerprint_mapping,
+                             load_embeddings, load_inlinks, parse_embeddings)
+
+
+@pytest.mark.parametrize('embedding_str, expected', [
+    ('[1,2,3]', [1, 2, 3]),
+    (' [1, 2 ,3] ', [1, 2, 3]),
+    ('[1,2,3,]', [1, 2, 3]),
+    ('[1,,3]', [1, 3]),
+    ('[ 1 , , 3 ]', [1, 3]),
+    ('[,1,2]', [1, 2]),
+])
+def test_convert_embeddings_ignores_empty_elements(embedding_str, expected):
+    values = convert_embeddings(embedding_str)
+    assert values.dtype == np.float32
+    assert values.tolist() == expected
+
+
+@pytest.mark.parametrize('embedding_str', ['[]', '[,]', '', '[1,x,3]', None, 5])
+def test_convert_embeddings_rejects_invalid(embedding_str):
+    assert convert_embeddings(embedding_str) is None
+
+
+@pytest.mark.parametrize('tile_bytes', [1, 4096, data_processing.SIMILARITY_TILE_BYTES])
+def test_top_k_numpy_matches_full_sort(monkeypatch, tile_bytes):
+    monkeypatch.setattr(data_processing, 'SIMILARITY_TILE_BYTES', tile_bytes)
+    rng = np.random.default_rng(0)
+    normalized = data_processing._normalize(rng.standard_normal((300, 16)).astype(np.float32))
+    query_indices = np.arange(0, 300, 7)
+
+    indices, scores = data_processing._top_k_numpy(normalized, query_indices, k=6)
+
+    expected = np.sort(normalized[query_indices] @ normalized.T, axis=1)[:, ::-1][:, :6]
+    np.testing.assert_allclose(scores, expected, rtol=1e-6)
+    np.testing.assert_allclose(np.take_along_axis(normalized[query_indices] @ normalized.T, indices, axis=1),
+                               scores, rtol=1e-6)
+
+
+def test_parse_embeddings_builds_aligned_matrix():
+    matrix = parse_embeddings(pd.Series(['[1,2,3]', '[4, 5, 6,]', '[7,,8,9]']))
+    assert matrix.dtype == np.float32
+    assert matrix.tolist() == [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+
+
+@pytest.mark.parametrize('embedding_strs', [
+    ['[1,2,3]', '[1,2]'],
+    ['[1,2,3]', '[1,x,3]'],
+    ['[1,2,3]', '[]'],
+    [],
+])
+def test_parse_embeddings_rejects_invalid_column(embedding_strs):
+    assert parse_embeddings(pd.Series(embedding_strs, dtype=object)) is None
+
+
+def test_load_embeddings_rejects_missing_cell():
+    csv = b'URL,Embeddings\nhttps://a/x,"[1,2,3]"\nhttps://a/y,\nhttps://a/z,"[1,2,4]"\n'
+    assert load_embeddings(csv) == (None, None)
+
+
+def test_load_embeddings_returns_read_only_matrix():
+    df, embeddings = load_embeddings(b'URL,Embeddings\nhttps://a/x,"[1,2,3]"\nhttps://a/y,"[1,2,4]"\n')
+    assert df.columns.tolist() == ['URL']
+    assert embeddings.shape == (2, 3)
+    assert not embeddings.flags.writeable
+
+
+def test_fingerprint_mapping_depends_on_order_and_empty_keys():
+    related_pages = {
+        'https://a/x': [{'url': 'https://a/y', 'score': 0.9}, {'url': 'https://a/z', 'score': 0.8}],
+        'https://a/y': [{'url': 'https://a/x', 'score': 0.9}],
+    }
+    fingerprint = fingerprint_mapping(related_pages)
+
+    assert fingerprint == fingerprint_mapping({url: list(pages) for url, pages in related_pages.items()})
+    assert fingerprint != fingerprint_mapping(dict(reversed(related_pages.items())))
+    assert fingerprint != fingerprint_mapping({
+        'https://a/x': related_pages['https://a/x'][::-1],
+        'https://a/y': related_pages['https://a/y'],
+    })
+    assert fingerprint != fingerprint_mapping({**related_pages, 'https://a/z': []})
+
+
+def test_fingerprint_mapping_of_existing_links():
+    existing_links = {'https://a/x': {'https://a/y'}, 'https://a/y': {'https://a/x'}}
+    fingerprint = fingerprint_mapping(existing_links)
+
+    assert fingerprint == fingerprint_mapping({url: set(targets) for url, targets in existing_links.items()})
+    assert fingerprint != fingerprint_mapping({**existing_links, 'https://a/z': set()})
+    assert fingerprint != fingerprint_mapping({'https://a/x': {'https://a/y'}})
+    assert isinstance(fingerprint_mapping({}), int)
+
+
+def test_fingerprinted_dict_keeps_its_fingerprint_through_pickle():
+    import pickle
+
+    related_pages = FingerprintedDict({'https://a/x': [{'url': 'https://a/y', 'score': 0.9}]})
+    restored = pickle.loads(pickle.dumps(related_pages))
+
+    assert related_pages.fingerprint == fingerprint_mapping(dict(related_pages))
+    assert restored == related_pages and restored.fingerprint == related_pages.fingerprint
+
+
+def test_cache_hash_funcs_only_apply_to_fingerprinted_dicts():
+    calls = []
+
+    @data_processing.st.cache_data(show_spinner=False, hash_funcs=CACHE_HASH_FUNCS)
+    def count_keys(mapping):
+        calls.append(mapping)
+        return len(mapping)
+
+    count_keys.clear()
+    assert count_keys({'a': 1}) == 1
+    assert count_keys({'a': 1, 'b': 2}) == 2
+    assert count_keys(FingerprintedDict({'https://a/x': {'https://a/y'}})) == 1
+    assert count_keys(FingerprintedDict({'https://a/x': {'https://a/y'}})) == 1
+    assert len(calls) == 3
+
+
+def test_load_inlinks_converts_columns_and_fingerprints_file():
+    csv = b'Type,From,To,Anchor Text\nHyperlink,https://a/x,https://a/y,y\nHyperlink,https://a/y,https://a/x,x\n'
+    inlinks_df, fingerprint = load_inlinks(csv)
+
+    assert (inlinks_df.dtypes == 'category').all()
+    assert load_inlinks(csv)[1] == fingerprint
+    assert load_inlinks(csv.replace(b',y\n', b',z\n'))[1] != fingerprint
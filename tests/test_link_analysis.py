@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+from data_processing import FingerprintedDict
+from link_analysis import intern_links, process_inlinks
+
+
+def test_process_inlinks_keeps_hyperlinks_between_distinct_pages():
+    inlinks_df = pd.DataFrame({
+        'Type': ['Hyperlink', 'Hyperlink', 'Image', 'Hyperlink'],
+        'From': ['https://a/x', 'https://a/x', 'https://a/y', 'https://a/y'],
+        'To': ['https://a/y', 'https://a/x', 'https://a/x', 'https://a/z'],
+    }).astype('category')
+    existing_links, existing_pairs = process_inlinks(inlinks_df)
+
+    assert isinstance(existing_links, FingerprintedDict)
+    assert existing_links == {'https://a/x': {'https://a/y'}, 'https://a/y': {'https://a/z'}}
+    assert existing_pairs == {('https://a/x', 'https://a/y'), ('https://a/y', 'https://a/z')}
+
+
+def test_intern_links_is_read_only():
+    url_ids, links = intern_links(FingerprintedDict({'https://a/x': {'https://a/y'}, 'https://a/y': {'https://a/x'}}))
+
+    assert dict(url_ids) == {'https://a/x': 0, 'https://a/y': 1}
+    assert links == {(0, 1), (1, 0)}
+    with pytest.raises(TypeError):
+        url_ids['https://a/z'] = 2
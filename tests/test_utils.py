@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import extract_path_themes, extract_theme_from_url, extract_themes
+
+URLS = [
+    'https://www.example.com/blog/seo-tips',
+    'https://example.com/blog/',
+    'https://example.com/shop/product-1?ref=home#top',
+    'https://example.com/fr/guides/link-building/part-2',
+    'https://example.com',
+    'https://example.com/',
+    'https://example.com/www/com/',
+    'https://example.com:8080/Docs/API',
+    'HTTP://example.com/a//b',
+    'example.com/blog',
+    'mailto:team@example.com',
+    '',
+]
+
+
+@pytest.mark.parametrize('level', [1, 2, 3])
+def test_extract_path_themes_matches_extract_theme_from_url(level):
+    themes = extract_path_themes(pd.Series(URLS), level)
+    assert themes.tolist() == [extract_theme_from_url(url, level) for url in URLS]
+
+
+def test_extract_path_themes_ignores_the_series_index():
+    urls = pd.Series(URLS, index=np.arange(len(URLS)) * 10 + 5, name='URL')
+    expected = [extract_theme_from_url(url, 2) for url in URLS]
+
+    assert extract_path_themes(urls, 2).tolist() == expected
+    assert extract_path_themes(urls.rename_axis('position').iloc[::-1], 2).tolist() == expected[::-1]
+
+
+def test_extract_themes_keeps_index_and_missing_values():
+    urls = pd.Series([URLS[0], None, URLS[0], URLS[3]], index=list('abcd'), name='URL')
+    themes = extract_themes(urls)
+
+    assert themes.index.tolist() == list('abcd') and themes.name == 'URL'
+    assert themes.tolist() == ['Blog', 'Autres', 'Blog', 'Guides']
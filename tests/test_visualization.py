@@ -0,0 +1,79 @@
+import json
+import os
+import re
+
+import pytest
+from pyvis.network import Network
+
+import visualization
+from visualization import create_similarity_network
+
+RELATED_PAGES = {
+    'https://a.com/blog/x': [{'url': 'https://a.com/blog/y', 'score': 0.9},
+                             {'url': 'https://a.com/shop/z', 'score': 0.6},
+                             {'url': 'https://a.com/shop/w', 'score': 0.2}],
+    'https://a.com/blog/y': [{'url': 'https://a.com/blog/x', 'score': 0.9},
+                             {'url': 'https://a.com/shop/w', 'score': 0.7}],
+    'https://a.com/shop/z': [{'url': 'https://a.com/blog/x', 'score': 0.6},
+                             {'url': 'https://a.com/<tag>&q', 'score': 0.55}],
+    'https://a.com/about': [],
+}
+
+
+def network_data(html):
+    """Nœuds et liens sérialisés dans le HTML généré par pyvis."""
+    nodes = re.search(r'nodes = new vis\.DataSet\((.*)\);', html).group(1)
+    edges = re.search(r'edges = new vis\.DataSet\((.*)\);', html).group(1)
+    return json.loads(nodes), json.loads(edges)
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_similarity_network_matches_pyvis_api(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(visualization, 'orjson', None)
+    elif visualization.orjson is None:
+        pytest.skip('orjson non installé')
+
+    html_path = create_similarity_network(RELATED_PAGES, min_score=0.5)
+    with open(html_path, encoding='utf-8') as html_file:
+        nodes, edges = network_data(html_file.read())
+    os.remove(html_path)
+
+    # Réseau de référence construit par les méthodes publiques de pyvis, avec les mêmes attributs
+    node_options = {node['id']: node for node in nodes}
+    edge_options = {frozenset((edge['from'], edge['to'])): edge for edge in edges}
+    reference = Network(height="800px", width="100%", bgcolor="#ffffff", font_color="black")
+    for source_url, similar_pages in RELATED_PAGES.items():
+        for url in [source_url] + [page['url'] for page in similar_pages if page['score'] >= 0.5]:
+            options = node_options[url]
+            reference.add_node(url, label=options['label'], color=options['color'],
+                               title=options['title'], size=options['size'])
+    for source_url, similar_pages in RELATED_PAGES.items():
+        for page in similar_pages:
+            if page['score'] >= 0.5:
+                options = edge_options[frozenset((source_url, page['url']))]
+                reference.add_edge(source_url, page['url'], value=options['value'], title=options['title'],
+                                   color=options['color'], smooth=options['smooth'])
+
+    assert (nodes, edges) == network_data(reference.generate_html())
+    assert len(nodes) == 6 and len(edges) == 4
+
+
+def test_similarity_network_file_matches_generate_html(monkeypatch):
+    networks = []
+
+    class RecordingNetwork(Network):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            networks.append(self)
+
+    monkeypatch.setattr(visualization, 'Network', RecordingNetwork)
+    related_pages = {**RELATED_PAGES, 'https://a.com/href': [{'url': 'https://a.com/about', 'score': 0.8}]}
+
+    html_path = create_similarity_network(related_pages, min_score=0.5)
+    with open(html_path, encoding='utf-8') as html_file:
+        html = html_file.read()
+    os.remove(html_path)
+
+    # Une URL contenant « href » active le template des infobulles cliquables, comme generate_html
+    assert 'div.popup' in html and html == networks[0].generate_html()
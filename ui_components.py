@@ -1,6 +1,12 @@
 import streamlit as st
 import pandas as pd
-from typing import Dict, List, Set  # Ajoutez Set ici
+import numpy as np
+from typing import Dict, FrozenSet, List, Set, Tuple
+from data_processing import relations_to_frame
+from link_analysis import build_existing_pairs, links_exist
+
+# Types de lien entre deux pages similaires, indexés par lien direct (+1) et lien inverse (+2)
+LINK_TYPES = ["Aucun lien", "Lien unidirectionnel", "Lien inverse seulement", "Lien bidirectionnel"]
 
 
 def display_theme_analysis(theme_df: pd.DataFrame, min_cluster_size: int):
@@ -53,7 +59,7 @@ def display_link_analysis(link_stats: dict):
         st.metric("Moyenne de liens par page", f"{link_stats['avg_links_per_page']:.2f}")
     with col3:
         st.metric("Pages orphelines", link_stats['orphan_pages'])
-        st.metric("% pages orphelines", f"{(link_stats['orphan_pages'] / link_stats['total_pages'] * 100):.1f}%")
+        st.metric("% pages orphelines", f"{link_stats['pct_orphan']:.1f}%")
 
 
 def display_link_recommendations(link_analysis_df: pd.DataFrame):
@@ -76,7 +82,8 @@ def display_link_recommendations(link_analysis_df: pd.DataFrame):
     )
 
 
-def display_similarity_details(related_pages: Dict[str, List[Dict]], min_score: float, existing_links: Dict[str, Set[str]] = None) -> pd.DataFrame:
+def display_similarity_details(related_pages: Dict[str, List[Dict]], min_score: float, existing_links: Dict[str, Set[str]] = None,
+                               existing_pairs: FrozenSet[Tuple[str, str]] = None) -> pd.DataFrame:
     """
     Crée et affiche une table détaillée des similarités avec une URL par ligne,
     en évitant les doublons de relations.
@@ -85,53 +92,48 @@ def display_similarity_details(related_pages: Dict[str, List[Dict]], min_score:
         related_pages: Dictionnaire des pages similaires
         min_score: Score minimum de similarité à afficher
         existing_links: Dictionnaire des liens existants
+        existing_pairs: Paires (source, cible) des liens existants (si None, calculées depuis existing_links)
 
     Returns:
         DataFrame contenant les détails des similarités
     """
-    # Création de la liste des similarités
-    similarity_data = []
-    processed_pairs = set()  # Pour suivre les paires déjà traitées
-
-    for source_url, similar_pages in related_pages.items():
-        for page in similar_pages:
-            if page['score'] >= min_score:
-                target_url = page['url']
-
-                # Créer une paire triée pour éviter les doublons
-                pair = tuple(sorted([source_url, target_url]))
-
-                # Vérifier si le lien existe déjà
-                link_exists = False
-                if existing_links and source_url in existing_links:
-                    link_exists = target_url in existing_links[source_url]
-
-                # Vérifier si le lien inverse existe
-                inverse_link_exists = False
-                if existing_links and target_url in existing_links:
-                    inverse_link_exists = source_url in existing_links[target_url]
-
-                # Déterminer le type de lien
-                link_type = "Aucun lien"
-                if link_exists and inverse_link_exists:
-                    link_type = "Lien bidirectionnel"
-                elif link_exists:
-                    link_type = "Lien unidirectionnel"
-                elif inverse_link_exists:
-                    link_type = "Lien inverse seulement"
-
-                # Ne traiter la paire que si elle n'a pas déjà été vue
-                if pair not in processed_pairs:
-                    similarity_data.append({
-                        'URL principale': source_url,
-                        'URL similaire': target_url,
-                        'Score de similarité': page['score'],
-                        'Type de lien': link_type
-                    })
-                    processed_pairs.add(pair)
-
-    # Création du DataFrame
-    similarity_df = pd.DataFrame(similarity_data)
+    # Les pages similaires sont triées par score décroissant : le premier score est le maximum
+    # de la source, ce qui écarte d'emblée les sources sans aucune similarité suffisante
+    candidate_pages = {source_url: similar_pages for source_url, similar_pages in related_pages.items()
+                       if similar_pages and similar_pages[0]['score'] >= min_score}
+
+    if not candidate_pages:
+        st.info("Aucune similarité trouvée avec le score minimum sélectionné.")
+        return pd.DataFrame(columns=['URL principale', 'URL similaire', 'Score de similarité', 'Type de lien'])
+
+    relations = relations_to_frame(candidate_pages)
+    relations = relations[relations['score'] >= min_score]
+    sources = relations['source'].to_numpy()
+    targets = relations['target'].to_numpy()
+
+    # Créer une paire ordonnée pour éviter les doublons : seule la première occurrence est gardée
+    is_ordered = sources < targets
+    first_seen = ~pd.DataFrame({
+        'low': np.where(is_ordered, sources, targets),
+        'high': np.where(is_ordered, targets, sources)
+    }).duplicated().to_numpy()
+    sources, targets = sources[first_seen], targets[first_seen]
+
+    # Vérifier si le lien existe déjà, et si le lien inverse existe
+    if existing_pairs is None:
+        existing_pairs = build_existing_pairs(existing_links or {})
+    link_exists = links_exist(sources, targets, existing_pairs)
+    inverse_link_exists = links_exist(targets, sources, existing_pairs)
+
+    # Création du DataFrame en une fois, colonne par colonne (scores en float32),
+    # le type de lien étant stocké par son indice dans LINK_TYPES
+    link_codes = link_exists.astype(np.int8) + 2 * inverse_link_exists.astype(np.int8)
+    similarity_df = pd.DataFrame({
+        'URL principale': sources,
+        'URL similaire': targets,
+        'Score de similarité': relations['score'].to_numpy(dtype=np.float32)[first_seen],
+        'Type de lien': pd.Categorical.from_codes(link_codes, categories=LINK_TYPES)
+    })
 
     if not similarity_df.empty:
         # Tri par score de similarité décroissant
@@ -1,8 +1,40 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from typing import Dict, List, Set
-import re
+from advanced_link_analysis import (terms_mask, filter_url_series, get_url_detail_info, compute_cannibal_anchors,
+                                    index_similar_sources)
+from data_processing import FingerprintedDict, fingerprint_mapping
+from link_analysis import intern_links
+from utils import get_csv_bytes
+
+
+def get_cached_url_detail(url: str, inlinks_df: pd.DataFrame, related_pages: Dict,
+                          existing_links: Dict[str, Set[str]] = None) -> Dict:
+    """
+    Retourne les informations détaillées d'une URL, mémorisées dans la session par URL
+    tant que les données (empreinte des inlinks et des pages similaires) ne changent pas :
+    les sliders et cases à cocher de la vue détaillée ne relancent pas l'analyse.
+    Les empreintes sont calculées une fois par upload et par recherche, pas à chaque exécution.
+    """
+    related_pages = related_pages or {}
+    related_fingerprint = related_pages.fingerprint if isinstance(related_pages, FingerprintedDict) \
+        else fingerprint_mapping(related_pages)
+    fingerprint = (st.session_state.get('inlinks_fingerprint'), related_fingerprint)
+    url_details = st.session_state.get('url_details')
+    if url_details is None or url_details['fingerprint'] != fingerprint:
+        url_details = {'fingerprint': fingerprint, 'details': {}}
+        st.session_state['url_details'] = url_details
+
+    if url not in url_details['details']:
+        url_info = get_url_detail_info(url, inlinks_df, related_pages,
+                                       existing_links, compute_cannibal_anchors(inlinks_df),
+                                       index_similar_sources(related_pages),
+                                       intern_links(existing_links or {}))
+        url_details['details'][url] = url_info
+
+    return url_details['details'][url]
 
 
 def display_advanced_link_analysis(
@@ -107,9 +139,11 @@ def display_advanced_link_analysis(
     with tabs[2]:
         st.subheader("Distribution des liens entrants")
 
-        # Histogramme de distribution
-        link_dist = link_stats['incoming_links']['Liens reçus'].value_counts().sort_index().reset_index()
-        link_dist.columns = ['Nombre de liens', 'Nombre de pages']
+        # Histogramme de distribution (comptes entiers positifs : np.bincount, déjà trié par nombre de liens)
+        link_counts = link_stats['incoming_links']['Liens reçus'].to_numpy(dtype=np.int64)
+        histogram = np.bincount(link_counts)
+        nonzero = histogram.nonzero()[0]
+        link_dist = pd.DataFrame({'Nombre de liens': nonzero, 'Nombre de pages': histogram[nonzero]})
 
         st.bar_chart(link_dist.set_index('Nombre de liens'))
 
@@ -136,7 +170,7 @@ def display_advanced_link_analysis(
 
         # Pages avec le plus d'ancres distinctes
         st.subheader("Pages avec le plus d'ancres distinctes")
-        top_anchors = anchor_stats['distinct_anchors'].sort_values('Ancres distinctes', ascending=False).head(20)
+        top_anchors = anchor_stats['top_anchors']
 
         st.dataframe(
             top_anchors,
@@ -181,25 +215,19 @@ def display_advanced_link_analysis(
             exclude_pattern = st.text_input("URLs qui ne contiennent pas (séparées par des virgules):", "")
             exclude_terms = [term.strip() for term in exclude_pattern.split(',') if term.strip()]
 
-        # Appliquer les filtres
-        # Ne prendre que les pages qui ont au moins 1 ancre
-        bottom_anchors = anchor_stats['distinct_anchors'][anchor_stats['distinct_anchors']['Ancres distinctes'] > 0]
+        # Appliquer les filtres : les pages (toutes avec au moins 1 ancre) sont déjà triées par nombre
+        # d'ancres, le filtre max_anchors est donc une recherche dichotomique suivie d'une tranche
+        anchors_by_count = anchor_stats['anchors_by_count']
+        cut = anchors_by_count['Ancres distinctes'].searchsorted(max_anchors, side='right')
+        bottom_anchors = anchors_by_count.iloc[:cut]
 
-        # Filtre par nombre d'ancres
-        bottom_anchors = bottom_anchors[bottom_anchors['Ancres distinctes'] <= max_anchors]
-
-        # Filtre par termes d'inclusion
-        if include_terms:
-            mask = bottom_anchors['To'].str.contains('|'.join(include_terms), case=False)
-            bottom_anchors = bottom_anchors[mask]
-
-        # Filtre par termes d'exclusion
-        if exclude_terms:
-            mask = ~bottom_anchors['To'].str.contains('|'.join(exclude_terms), case=False)
+        # Termes d'inclusion/exclusion recherchés en un seul passage, seulement s'il y en a
+        if include_terms or exclude_terms:
+            mask = terms_mask(anchors_by_count['To'], include_terms, exclude_terms)[:cut]
             bottom_anchors = bottom_anchors[mask]
 
-        # Trier et limiter
-        bottom_anchors = bottom_anchors.sort_values('Ancres distinctes', ascending=True).head(display_rows)
+        # Limiter (déjà trié)
+        bottom_anchors = bottom_anchors.head(display_rows)
 
         # Afficher le nombre total d'URLs après filtrage
         st.write(f"{len(bottom_anchors)} pages affichées correspondant aux critères de filtrage")
@@ -216,211 +244,205 @@ def display_advanced_link_analysis(
 
         # Analyse détaillée par URL avec filtrage amélioré
         if inlinks_df is not None:
-            st.subheader("Analyse détaillée par URL")
-
-            # Récupérer toutes les URLs cibles
-            all_urls = anchor_stats['distinct_anchors']['To'].tolist()
-
-            # Interface de filtrage simplifiée
-            with st.expander("Options de filtrage avancées", expanded=True):
-                # Option 1: Filtrage simple par inclusion/exclusion
-                st.subheader("Filtrage simple")
-                col1, col2 = st.columns([1, 1])
+            display_url_detail_analysis(anchor_stats, inlinks_df, related_pages, existing_links)
 
-                with col1:
-                    include_pattern = st.text_input("URLs qui contiennent:", "", key="detail_include")
-
-                with col2:
-                    exclude_pattern = st.text_input("URLs qui ne contiennent pas:", "", key="detail_exclude")
-
-                # Option 2: Filtrage par Regex pour utilisateurs avancés
-                st.subheader("Filtrage avancé (Regex)")
-                col1, col2 = st.columns([3, 1])
-
-                with col1:
-                    regex_filter = st.text_input("Expression régulière:", "")
-
-                with col2:
-                    regex_help = st.button("Aide Regex", help="Affiche des exemples d'expressions régulières courantes")
-
-            # Afficher l'aide si demandé
-            if regex_help:
-                st.info("""
-                **Exemples d'expressions régulières utiles:**
-                - `blog` : URLs contenant "blog"
-                - `^https://www\\.example\\.com/blog/` : URLs commençant par "https://www.example.com/blog/"
-                - `(blog|article)` : URLs contenant "blog" OU "article"
-                - `\\.html$` : URLs se terminant par ".html"
-                - `product/[0-9]+` : URLs contenant "product/" suivi de chiffres
-                """)
-
-            # Appliquer les filtres
-            filtered_urls = all_urls
-
-            # Appliquer le filtre d'inclusion simple
-            if include_pattern:
-                filtered_urls = [url for url in filtered_urls if include_pattern.lower() in url.lower()]
-
-            # Appliquer le filtre d'exclusion simple
-            if exclude_pattern:
-                filtered_urls = [url for url in filtered_urls if exclude_pattern.lower() not in url.lower()]
-
-            # Appliquer le filtre regex (avancé) si fourni
-            if regex_filter:
-                try:
-                    pattern = re.compile(regex_filter, flags=re.IGNORECASE)
-                    filtered_urls = [url for url in filtered_urls if pattern.search(url)]
-                except re.error:
-                    st.error(f"Expression régulière invalide: {regex_filter}")
-
-            # Trier les URLs pour une meilleure lisibilité
-            filtered_urls.sort()
-
-            # Afficher le nombre d'URLs après filtrage
-            st.write(f"{len(filtered_urls)} URLs correspondent aux critères de filtrage")
-
-            # Sélecteur d'URL
-            if filtered_urls:
-                selected_url = st.selectbox("Sélectionner une URL pour l'analyse détaillée:", filtered_urls)
-
-                if selected_url:
-                    st.subheader(f"Analyse détaillée de: {selected_url}")
-
-                    # Récupérer les informations détaillées pour cette URL
-                    from advanced_link_analysis import get_url_detail_info
-                    url_info = get_url_detail_info(selected_url, inlinks_df, anchor_stats, related_pages,
-                                                   existing_links)
-
-                    # Afficher les métriques
-                    col1, col2, col3, col4 = st.columns(4)
-
-                    with col1:
-                        st.metric("Liens internes", url_info['total_links'])
-
-                    with col2:
-                        st.metric("Liens uniques", url_info['unique_links'])
-
-                    with col3:
-                        st.metric("Ancres différentes", url_info['distinct_anchors_count'])
-
-                    with col4:
-                        st.metric("Ancres cannibales", len(url_info['cannibal_anchors']))
-
-                    # Liste des ancres cannibales
-                    if url_info['cannibal_anchors']:
-                        st.subheader("✏️ Liste des ancres cannibales :")
-                        for anchor in url_info['cannibal_anchors']:
-                            st.write(f"- {anchor}")
-
-                    # Liste de toutes les ancres
-                    st.subheader("⚓ Liste des ancres :")
-                    for anchor in url_info['anchor_list']:
-                        # Mettre en surbrillance les ancres cannibales
-                        if anchor in url_info['cannibal_anchors']:
-                            st.markdown(f"- **{anchor}** _(cannibale)_")
-                        else:
-                            st.write(f"- {anchor}")
-
-                    # Tableau des pages sources
-                    st.subheader("📄 Pages pointant vers cette URL:")
-
-                    # Créer un DataFrame pour l'affichage
-                    source_df = pd.DataFrame(url_info['source_pages'])
-
-                    if not source_df.empty:
-                        # Ajouter une colonne pour le score formaté
-                        source_df['Score'] = source_df['similarity'].apply(
-                            lambda x: f"{x:.3f}" if x is not None else "N/A"
-                        )
-
-                        st.dataframe(
-                            source_df[['url', 'anchor', 'Score']],
-                            column_config={
-                                "url": "URL source",
-                                "anchor": "Texte d'ancre",
-                                "Score": "Score de similarité"
-                            },
-                            use_container_width=True,
-                            hide_index=True
-                        )
-                    else:
-                        st.info("Aucune page ne pointe vers cette URL.")
-
-                    # Nouvelle section: Opportunités de maillage interne
-                    st.subheader("📊 Opportunités de maillage interne:")
-
-                    # Slider pour le seuil de similarité
-                    similarity_threshold = st.slider(
-                        "Seuil de similarité minimum",
-                        min_value=0.50,
-                        max_value=1.0,
-                        value=0.85,  # Valeur par défaut à 85% (plus réaliste)
-                        step=0.05,
-                        format="%.2f",
-                        help="Pages avec un score de similarité supérieur ou égal à ce seuil"
-                    )
 
-                    # Afficher les liens existants ou non
-                    show_existing_links = st.checkbox("Afficher aussi les liens déjà existants", value=False)
-
-                    # Filtrer les opportunités selon le seuil de similarité et les préférences d'affichage
-                    filtered_opportunities = []
-                    for opp in url_info['linking_opportunities']:
-                        if opp['similarity_score'] >= similarity_threshold:
-                            if not opp.get('link_exists', False) or show_existing_links:
-                                filtered_opportunities.append(opp)
-
-                    if filtered_opportunities:
-                        # Convertir en DataFrame pour l'affichage
-                        opps_df = pd.DataFrame(filtered_opportunities)
-
-                        # Ajouter une colonne pour le type de lien
-                        opps_df['type_lien'] = opps_df.apply(
-                            lambda x: "Lien déjà existant" if x.get('link_exists', False) else
-                            ("Lien inverse suggéré" if x.get('is_reverse', False) else "Lien suggéré"),
-                            axis=1
-                        )
-
-                        # Formater le score pour l'affichage
-                        opps_df['score_formatted'] = opps_df['similarity_score'].apply(lambda x: f"{x:.3f}")
-
-                        # Afficher le DataFrame avec des styles personnalisés
-                        st.dataframe(
-                            opps_df[['source_url', 'score_formatted', 'type_lien']],
-                            column_config={
-                                "source_url": st.column_config.TextColumn("URL source", width="large"),
-                                "score_formatted": st.column_config.TextColumn("Score de similarité", width="medium"),
-                                "type_lien": st.column_config.TextColumn("Type", width="medium")
-                            },
-                            use_container_width=True,
-                            hide_index=True
-                        )
-
-                        # Information sur le nombre d'opportunités
-                        total_new = len([o for o in filtered_opportunities if not o.get('link_exists', False)])
-                        total_existing = len([o for o in filtered_opportunities if o.get('link_exists', False)])
-
-                        if show_existing_links and total_existing > 0:
-                            st.info(
-                                f"{total_new} nouvelles opportunités et {total_existing} liens existants trouvés avec un score ≥ {similarity_threshold:.2f}")
-                        else:
-                            st.info(
-                                f"{total_new} opportunités de maillage interne trouvées avec un score ≥ {similarity_threshold:.2f}")
-
-                        # Option pour télécharger les opportunités
-                        if len(filtered_opportunities) > 0:
-                            # Filtrer seulement les opportunités sans liens existants pour l'export
-                            export_opps = [o for o in filtered_opportunities if not o.get('link_exists', False)]
-                            if export_opps:
-                                export_df = pd.DataFrame(export_opps)[['source_url', 'similarity_score']]
-                                csv_data = export_df.to_csv(index=False)
-                                st.download_button(
-                                    label="Télécharger les opportunités (CSV)",
-                                    data=csv_data,
-                                    file_name=f"opportunites_{selected_url.split('/')[-1]}.csv",
-                                    mime="text/csv"
-                                )
-                    else:
-                        st.info(f"Aucune opportunité de maillage trouvée avec un score ≥ {similarity_threshold:.2f}")
+@st.fragment
+def display_url_detail_analysis(
+        anchor_stats: Dict,
+        inlinks_df: pd.DataFrame,
+        related_pages: Dict = None,
+        existing_links: Dict[str, Set[str]] = None
+):
+    """
+    Affiche l'analyse détaillée par URL. Fragment Streamlit : les filtres, le sélecteur d'URL
+    et les sliders de cette section ne relancent que ce fragment, pas le reste de la page.
+    """
+    st.subheader("Analyse détaillée par URL")
+
+    # Récupérer toutes les URLs cibles
+    url_series = anchor_stats['distinct_anchors']['To']
+
+    # Interface de filtrage simplifiée
+    with st.expander("Options de filtrage avancées", expanded=True):
+        # Option 1: Filtrage simple par inclusion/exclusion
+        st.subheader("Filtrage simple")
+        col1, col2 = st.columns([1, 1])
+
+        with col1:
+            include_pattern = st.text_input("URLs qui contiennent:", "", key="detail_include")
+
+        with col2:
+            exclude_pattern = st.text_input("URLs qui ne contiennent pas:", "", key="detail_exclude")
+
+        # Option 2: Filtrage par Regex pour utilisateurs avancés
+        st.subheader("Filtrage avancé (Regex)")
+        col1, col2 = st.columns([3, 1])
+
+        with col1:
+            regex_filter = st.text_input("Expression régulière:", "")
+
+        with col2:
+            regex_help = st.button("Aide Regex", help="Affiche des exemples d'expressions régulières courantes")
+
+    # Afficher l'aide si demandé
+    if regex_help:
+        st.info("""
+        **Exemples d'expressions régulières utiles:**
+        - `blog` : URLs contenant "blog"
+        - `^https://www\\.example\\.com/blog/` : URLs commençant par "https://www.example.com/blog/"
+        - `(blog|article)` : URLs contenant "blog" OU "article"
+        - `\\.html$` : URLs se terminant par ".html"
+        - `product/[0-9]+` : URLs contenant "product/" suivi de chiffres
+        """)
+
+    # Appliquer les filtres d'inclusion, d'exclusion et regex en un seul masque
+    filtered_urls = filter_url_series(url_series, include_pattern, exclude_pattern, regex_filter)
+
+    # Trier les URLs pour une meilleure lisibilité
+    filtered_urls.sort()
+
+    # Afficher le nombre d'URLs après filtrage
+    st.write(f"{len(filtered_urls)} URLs correspondent aux critères de filtrage")
+
+    # Sélecteur d'URL
+    if filtered_urls:
+        selected_url = st.selectbox("Sélectionner une URL pour l'analyse détaillée:", filtered_urls)
+
+        if selected_url:
+            st.subheader(f"Analyse détaillée de: {selected_url}")
+
+            # Récupérer les informations détaillées pour cette URL
+            url_info = get_cached_url_detail(selected_url, inlinks_df, related_pages, existing_links)
+
+            # Afficher les métriques
+            col1, col2, col3, col4 = st.columns(4)
+
+            with col1:
+                st.metric("Liens internes", url_info['total_links'])
+
+            with col2:
+                st.metric("Liens uniques", url_info['unique_links'])
+
+            with col3:
+                st.metric("Ancres différentes", url_info['distinct_anchors_count'])
+
+            with col4:
+                st.metric("Ancres cannibales", len(url_info['cannibal_anchors']))
+
+            # Liste des ancres cannibales
+            if url_info['cannibal_anchors']:
+                st.subheader("✏️ Liste des ancres cannibales :")
+                for anchor in url_info['cannibal_anchors']:
+                    st.write(f"- {anchor}")
+
+            # Liste de toutes les ancres
+            st.subheader("⚓ Liste des ancres :")
+            for anchor in url_info['anchor_list']:
+                # Mettre en surbrillance les ancres cannibales
+                if anchor in url_info['cannibal_anchors']:
+                    st.markdown(f"- **{anchor}** _(cannibale)_")
                 else:
-                    st.info("Aucune URL ne correspond aux critères de filtrage.")
\ No newline at end of file
+                    st.write(f"- {anchor}")
+
+            # Tableau des pages sources
+            st.subheader("📄 Pages pointant vers cette URL:")
+
+            # Créer un DataFrame pour l'affichage
+            source_df = pd.DataFrame(url_info['source_pages'])
+
+            if not source_df.empty:
+                # Ajouter une colonne pour le score formaté
+                # (None devient NaN dans le DataFrame : affiché "N/A")
+                similarity = pd.to_numeric(source_df['similarity'], errors='coerce')
+                source_df['Score'] = similarity.map('{:.3f}'.format)
+                source_df.loc[similarity.isna(), 'Score'] = "N/A"
+
+                st.dataframe(
+                    source_df[['url', 'anchor', 'Score']],
+                    column_config={
+                        "url": "URL source",
+                        "anchor": "Texte d'ancre",
+                        "Score": "Score de similarité"
+                    },
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.info("Aucune page ne pointe vers cette URL.")
+
+            # Nouvelle section: Opportunités de maillage interne
+            st.subheader("📊 Opportunités de maillage interne:")
+
+            # Slider pour le seuil de similarité
+            similarity_threshold = st.slider(
+                "Seuil de similarité minimum",
+                min_value=0.50,
+                max_value=1.0,
+                value=0.85,  # Valeur par défaut à 85% (plus réaliste)
+                step=0.05,
+                format="%.2f",
+                help="Pages avec un score de similarité supérieur ou égal à ce seuil"
+            )
+
+            # Afficher les liens existants ou non
+            show_existing_links = st.checkbox("Afficher aussi les liens déjà existants", value=False)
+
+            # Filtrer les opportunités selon le seuil de similarité et les préférences d'affichage
+            # (masques NumPy sur le DataFrame mémorisé avec le détail de l'URL)
+            all_opps_df = url_info['linking_opportunities']
+            all_exists = all_opps_df['link_exists'].to_numpy()
+            mask = (all_opps_df['similarity_score'].to_numpy() >= similarity_threshold) & (
+                    show_existing_links | ~all_exists)
+            exists = all_exists[mask]
+
+            if mask.any():
+                opps_df = all_opps_df.loc[mask].copy()
+
+                # Ajouter une colonne pour le type de lien
+                opps_df['type_lien'] = np.select(
+                    [exists, opps_df['is_reverse'].to_numpy()],
+                    ["Lien déjà existant", "Lien inverse suggéré"],
+                    default="Lien suggéré"
+                )
+
+                # Formater le score pour l'affichage
+                opps_df['score_formatted'] = opps_df['similarity_score'].map('{:.3f}'.format)
+
+                # Afficher le DataFrame avec des styles personnalisés
+                st.dataframe(
+                    opps_df[['source_url', 'score_formatted', 'type_lien']],
+                    column_config={
+                        "source_url": st.column_config.TextColumn("URL source", width="large"),
+                        "score_formatted": st.column_config.TextColumn("Score de similarité", width="medium"),
+                        "type_lien": st.column_config.TextColumn("Type", width="medium")
+                    },
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+                # Information sur le nombre d'opportunités
+                total_existing = int(exists.sum())
+                total_new = len(exists) - total_existing
+
+                if show_existing_links and total_existing > 0:
+                    st.info(
+                        f"{total_new} nouvelles opportunités et {total_existing} liens existants trouvés avec un score ≥ {similarity_threshold:.2f}")
+                else:
+                    st.info(
+                        f"{total_new} opportunités de maillage interne trouvées avec un score ≥ {similarity_threshold:.2f}")
+
+                # Option pour télécharger les opportunités
+                # Exporter seulement les opportunités sans liens existants
+                if total_new > 0:
+                    export_df = opps_df.loc[~exists, ['source_url', 'similarity_score']]
+                    st.download_button(
+                        label="Télécharger les opportunités (CSV)",
+                        data=get_csv_bytes(export_df),
+                        file_name=f"opportunites_{selected_url.split('/')[-1]}.csv",
+                        mime="text/csv"
+                    )
+            else:
+                st.info(f"Aucune opportunité de maillage trouvée avec un score ≥ {similarity_threshold:.2f}")
+        else:
+            st.info("Aucune URL ne correspond aux critères de filtrage.")
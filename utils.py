@@ -1,46 +1,112 @@
-import base64
-import hashlib
+import io
+import zlib
 import colorsys
+from functools import lru_cache
 from typing import Dict, List
+from urllib.parse import urlsplit
+import numpy as np
 import pandas as pd
+import streamlit as st
 
+# Durée de conservation (en secondes) des CSV mis en cache pour les boutons de téléchargement
+CSV_CACHE_TTL = 600
 
-def get_download_link(df: pd.DataFrame, key_suffix: str = "") -> str:
-    """Génère un lien de téléchargement pour le DataFrame avec une clé unique."""
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
+# Segments de chemin ignorés lors de l'extraction du thème d'une URL
+SKIPPED_PATH_SEGMENTS = frozenset({'www', 'fr', 'com', 'net', 'org'})
 
-    # Ajouter le suffixe à l'ID HTML pour le rendre unique
-    download_id = f"download_link_{key_suffix}" if key_suffix else "download_link"
+# Chemin d'une URL absolue (après le schéma et l'hôte, avant la requête et le fragment)
+URL_PATH_PATTERN = r'^[A-Za-z][A-Za-z0-9+.-]*://[^/?#]+(?P<path>[^?#]*)'
 
-    return f'<a id="{download_id}" href="data:file/csv;base64,{b64}" download="resultats.csv">Télécharger les résultats (CSV)</a>'
 
+@st.cache_data(show_spinner=False, ttl=CSV_CACHE_TTL)
+def get_csv_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Sérialise le DataFrame en CSV (UTF-8) pour st.download_button.
+    Le CSV est écrit par blocs dans un tampon binaire, sans chaîne intermédiaire complète.
+    Mis en cache : le CSV n'est pas régénéré à chaque rerun tant que le DataFrame ne change pas.
+    """
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, encoding='utf-8')
+    return buffer.getvalue()
 
+
+@lru_cache(maxsize=65536)
 def extract_theme_from_url(url: str, level: int = 1) -> str:
-    """Extrait le thème à partir de l'URL en se basant sur le niveau spécifié."""
+    """
+    Extrait le thème à partir du chemin de l'URL en se basant sur le niveau spécifié.
+    Mémorisé par URL : les mêmes URLs reviennent dans toutes les analyses.
+    """
     try:
-        path = url.split('://')[1].split('/')
-        path = [p for p in path if p and p not in ['www', 'fr', 'com', 'net', 'org']]
+        parts = urlsplit(url)
+    except (AttributeError, TypeError, ValueError):
+        return 'Autres'
 
-        if len(path) >= level:
-            theme = path[level - 1]
-            return theme.replace('-', ' ').title()
+    if not parts.netloc:
+        return 'Autres'
 
-        if path:
-            theme = path[-1]
-            return theme.replace('-', ' ').title()
+    path = [p for p in parts.path.split('/') if p and p not in SKIPPED_PATH_SEGMENTS]
 
-        return 'Autres'
-    except:
-        return 'Autres'
+    if len(path) >= level:
+        theme = path[level - 1]
+        return theme.replace('-', ' ').title()
+
+    if path:
+        theme = path[-1]
+        return theme.replace('-', ' ').title()
+
+    return 'Autres'
+
+
+def extract_path_themes(urls: pd.Series, level: int = 1) -> np.ndarray:
+    """
+    Équivalent vectorisé d'extract_theme_from_url : les chemins sont extraits et découpés
+    par les méthodes de chaînes de pandas, puis le segment retenu pour chaque URL est choisi
+    par position dans un seul passage sur l'ensemble des segments.
+
+    Args:
+        urls: Série d'URLs
+        level: Niveau du dossier servant de thème
+
+    Returns:
+        Tableau des thèmes, aligné sur les URLs
+    """
+    # Index positionnel : les segments sont rattachés à leur URL par sa position
+    paths = urls.astype(str).reset_index(drop=True).str.extract(URL_PATH_PATTERN, expand=False)
+    segments = paths.str.split('/').explode()
+    segments = segments[segments.notna() & (segments != '') & ~segments.isin(SKIPPED_PATH_SEGMENTS)]
+    url_positions = segments.index.to_numpy()
+
+    # Segment de rang level, ou dernier segment si le chemin est moins profond
+    by_url = segments.groupby(level=0, sort=False)
+    rank = by_url.cumcount().to_numpy()
+    depth = by_url.transform('size').to_numpy()
+    picked = rank == np.minimum(level, depth) - 1
+
+    themes = np.full(len(urls), 'Autres', dtype=object)
+    themes[url_positions[picked]] = segments[picked].str.replace('-', ' ').str.title().to_numpy()
+    return themes
+
+
+def extract_themes(urls: pd.Series, level: int = 1) -> pd.Series:
+    """
+    Extrait les thèmes d'une série d'URLs : chaque URL distincte n'est analysée qu'une fois,
+    puis les thèmes sont redistribués sur la série par leurs codes.
+    """
+    codes, uniques = pd.factorize(urls)
+    # Le dernier élément ('Autres') est sélectionné par le code -1 des valeurs manquantes
+    themes = np.append(extract_path_themes(pd.Series(uniques), level), 'Autres')
+    return pd.Series(themes[codes], index=urls.index, name=urls.name)
 
 
+@lru_cache(maxsize=4096)
 def get_theme_color(theme: str) -> str:
-    """Retourne une couleur aléatoire mais cohérente pour un thème donné."""
-    hash_object = hashlib.md5(theme.encode())
-    hash_hex = hash_object.hexdigest()
+    """
+    Retourne une couleur aléatoire mais cohérente pour un thème donné.
+    La teinte vient d'un CRC32 (hash non cryptographique) et chaque thème n'est calculé qu'une fois.
+    """
+    hash_value = zlib.crc32(theme.encode('utf-8')) & 0xFFFFFFFF
 
-    hue = int(hash_hex[:2], 16) / 255 * 360
+    hue = (hash_value & 0xFF) / 255 * 360
     saturation = 0.7
     lightness = 0.5
 
@@ -52,6 +118,7 @@ def get_theme_color(theme: str) -> str:
     )
 
 
+@lru_cache(maxsize=65536)
 def get_readable_label(url: str) -> str:
     """Crée une étiquette lisible à partir de l'URL."""
     label = url.split('/')[-2] if url.endswith('/') else url.split('/')[-1]
@@ -1,11 +1,118 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Set
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from pyvis.network import Network
 import json
+import os
 import tempfile
+from collections import Counter
+from itertools import chain
+from operator import itemgetter
+import networkx as nx
 import plotly.graph_objects as go
-from utils import get_theme_color, get_readable_label, extract_theme_from_url
+from colour import Color
+from utils import get_readable_label, extract_themes
+from data_processing import relations_to_arrays, links_to_arrays
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel : repli sur le module json standard
+    orjson = None
+
+try:
+    import nx_cugraph
+except ImportError:  # nx-cugraph est optionnel : sans GPU, la mise en page reste calculée par vis.js
+    nx_cugraph = None
+
+# Nombre maximal de thématiques affichées dans la heatmap (les moins actives sont regroupées)
+MAX_HEATMAP_THEMES = 150
+
+# Libellé de la catégorie regroupant les thématiques les moins actives
+OTHER_THEMES_LABEL = 'Autres thématiques'
+
+# Couleurs semi-transparentes des liens du réseau, une par niveau de score quantifié (transparence = score)
+EDGE_COLOR_LEVELS = 32
+EDGE_COLORS = [f"rgba(128, 128, 128, {level / (EDGE_COLOR_LEVELS - 1):.3f})" for level in range(EDGE_COLOR_LEVELS)]
+
+# Nombre de nœuds à partir duquel la mise en page du réseau est précalculée sur GPU
+LAYOUT_PRECOMPUTE_MIN_NODES = 2000
+
+# Étendue (en pixels vis.js) de la mise en page précalculée, par racine carrée du nombre de nœuds
+LAYOUT_SCALE_PER_NODE = 50
+
+# Taille du tampon d'écriture du fichier HTML du réseau de similarité
+HTML_WRITE_BUFFER_SIZE = 1 << 20
+
+
+def bucket_rare_themes(theme_counts: np.ndarray, all_themes: List[str],
+                       max_themes: int = MAX_HEATMAP_THEMES) -> Tuple[np.ndarray, List[str]]:
+    """
+    Regroupe les thématiques les moins actives dans une seule catégorie quand il y en a plus
+    de max_themes, pour que la heatmap reste lisible et fluide dans le navigateur.
+
+    Args:
+        theme_counts: Tableau (n, n, 2) des liens existants et potentiels entre thématiques
+        all_themes: Thématiques (triées) correspondant aux lignes et colonnes
+        max_themes: Nombre maximal de thématiques affichées, catégorie de regroupement comprise
+
+    Returns:
+        Tuple (tableau des comptes regroupés, libellés des thématiques)
+    """
+    n_themes = len(all_themes)
+    if n_themes <= max_themes:
+        return theme_counts, all_themes
+
+    # Activité de chaque thématique : liens sortants et entrants, existants et potentiels
+    activity = theme_counts.sum(axis=(1, 2)) + theme_counts.sum(axis=(0, 2))
+
+    # Thématiques conservées (dans l'ordre alphabétique), suivies de toutes les autres
+    kept = np.sort(np.argsort(-activity, kind='stable')[:max_themes - 1])
+    others = np.setdiff1d(np.arange(n_themes), kept)
+    order = np.concatenate([kept, others])
+
+    # Une tranche par thématique conservée, puis une seule tranche pour les autres
+    bounds = np.arange(max_themes)
+    theme_counts = theme_counts[order][:, order]
+    theme_counts = np.add.reduceat(np.add.reduceat(theme_counts, bounds, axis=0), bounds, axis=1)
+
+    return theme_counts, [all_themes[idx] for idx in kept] + [OTHER_THEMES_LABEL]
+
+
+def orjson_dumps(obj, **kwargs) -> str:
+    """
+    Remplace json.dumps pour le filtre tojson du template pyvis (nœuds et liens du réseau).
+    Les clés restent triées comme avec la politique par défaut de Jinja.
+    """
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def filter_relations(semantic_relations: Dict[str, List[Dict]], min_score: float) -> Dict[str, List[Dict]]:
+    """
+    Ne garde, pour chaque page source, que les pages similaires au score >= min_score.
+    Filtre appliqué une seule fois en entrée des visualisations, les boucles suivantes
+    n'ayant plus à tester le score.
+    """
+    return {
+        source: [page for page in similar_pages if page['score'] >= min_score]
+        for source, similar_pages in semantic_relations.items()
+    }
+
+
+def count_theme_pairs(url_lookup: pd.Index, theme_codes: np.ndarray,
+                      sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    Compte les liens (sources[i] -> targets[i]) entre thématiques dans une matrice carrée.
+    Les URLs sont converties en indices de thématique par url_lookup / theme_codes (les liens
+    dont une extrémité est inconnue sont ignorés), puis comptées en un seul np.bincount
+    sur l'indice linéaire source * n_themes + cible.
+    """
+    n_themes = int(theme_codes.max()) + 1 if len(theme_codes) else 0
+    source_pos = url_lookup.get_indexer(sources)
+    target_pos = url_lookup.get_indexer(targets)
+    known = (source_pos >= 0) & (target_pos >= 0)
+
+    linear_index = theme_codes[source_pos[known]] * n_themes + theme_codes[target_pos[known]]
+    return np.bincount(linear_index, minlength=n_themes * n_themes).reshape(n_themes, n_themes)
 
 
 def create_theme_heatmap(df: pd.DataFrame, existing_links: Dict[str, Set[str]],
@@ -18,42 +125,39 @@ def create_theme_heatmap(df: pd.DataFrame, existing_links: Dict[str, Set[str]],
     - Le ratio de couverture (liens existants / liens potentiels)
     """
     # Extraire les thématiques de toutes les URLs
-    url_themes = {url: extract_theme_from_url(url) for url in df['URL']}
-    all_themes = sorted(list(set(url_themes.values())))
+    url_themes = dict(zip(df['URL'], extract_themes(df['URL'])))
 
-    # Initialiser les matrices pour les liens existants et potentiels
+    # Indexer les thématiques (triées) ; theme_codes donne la thématique de chaque URL de url_lookup
+    theme_codes, all_themes = pd.factorize(pd.Series(list(url_themes.values()), dtype=object), sort=True)
+    all_themes = all_themes.tolist()
+    url_lookup = pd.Index(list(url_themes))
+
+    # Initialiser les matrices pour les liens existants et potentiels : un même tableau
+    # (n, n, 2) en float32, transmis tel quel à Plotly comme customdata
     n_themes = len(all_themes)
-    existing_matrix = np.zeros((n_themes, n_themes))
-    potential_matrix = np.zeros((n_themes, n_themes))
+    theme_counts = np.zeros((n_themes, n_themes, 2), dtype=np.float32)
 
     # Compter les liens existants entre thématiques
-    for source, targets in existing_links.items():
-        if source in url_themes:
-            source_theme = url_themes[source]
-            source_idx = all_themes.index(source_theme)
-            for target in targets:
-                if target in url_themes:
-                    target_theme = url_themes[target]
-                    target_idx = all_themes.index(target_theme)
-                    existing_matrix[source_idx][target_idx] += 1
-
-    # Compter les liens potentiels basés sur la similarité
-    for source, similar_pages in semantic_relations.items():
-        if source in url_themes:
-            source_theme = url_themes[source]
-            source_idx = all_themes.index(source_theme)
-            for page in similar_pages:
-                if page['score'] >= min_score and page['url'] in url_themes:
-                    target_theme = url_themes[page['url']]
-                    target_idx = all_themes.index(target_theme)
-                    potential_matrix[source_idx][target_idx] += 1
-
-    # Calculer le ratio de couverture
-    coverage_matrix = np.zeros((n_themes, n_themes))
-    for i in range(n_themes):
-        for j in range(n_themes):
-            if potential_matrix[i][j] > 0:
-                coverage_matrix[i][j] = existing_matrix[i][j] / potential_matrix[i][j]
+    sources, targets = links_to_arrays(existing_links)
+    theme_counts[:, :, 0] = count_theme_pairs(url_lookup, theme_codes, sources, targets)
+
+    # Compter les liens potentiels basés sur la similarité (au-dessus du score minimum, comparé
+    # en float64 comme les scores d'origine)
+    sources, targets, scores = relations_to_arrays(semantic_relations)
+    above_min_score = scores.astype(np.float64) >= min_score
+    theme_counts[:, :, 1] = count_theme_pairs(url_lookup, theme_codes,
+                                              sources[above_min_score], targets[above_min_score])
+
+    # Regrouper les thématiques les moins actives si elles sont trop nombreuses
+    theme_counts, all_themes = bucket_rare_themes(theme_counts, all_themes)
+    n_themes = len(all_themes)
+    existing_matrix = theme_counts[:, :, 0]
+    potential_matrix = theme_counts[:, :, 1]
+
+    # Calculer le ratio de couverture (nul là où aucun lien potentiel n'existe), en float32
+    # comme les comptes pour alléger les données envoyées au navigateur
+    coverage_matrix = np.divide(existing_matrix, potential_matrix,
+                                out=np.zeros((n_themes, n_themes), dtype=np.float32), where=potential_matrix > 0)
 
     # Créer la heatmap avec Plotly
     fig = go.Figure()
@@ -66,6 +170,7 @@ def create_theme_heatmap(df: pd.DataFrame, existing_links: Dict[str, Set[str]],
         colorscale='RdYlGn',  # Rouge (sous-maillé) à Vert (bien maillé)
         zmin=0,
         zmax=1,
+        zsmooth=False,
         name='Ratio de couverture',
         hoverongaps=False,
         hovertemplate=(
@@ -75,7 +180,7 @@ def create_theme_heatmap(df: pd.DataFrame, existing_links: Dict[str, Set[str]],
                 'Couverture: %{z:.1%}<br>' +
                 '<extra></extra>'
         ),
-        customdata=np.dstack((existing_matrix, potential_matrix))
+        customdata=theme_counts
     ))
 
     # Mise en forme
@@ -91,10 +196,42 @@ def create_theme_heatmap(df: pd.DataFrame, existing_links: Dict[str, Set[str]],
     return fig
 
 
+def compute_gpu_layout(node_urls: List[str],
+                       weighted_edges: Iterable[Tuple[str, str, float]]) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Précalcule la mise en page forceAtlas2 du réseau sur GPU via le backend nx-cugraph.
+
+    Args:
+        node_urls: URLs des nœuds du réseau
+        weighted_edges: Liens (source, cible, poids)
+
+    Returns:
+        Positions (x, y) de chaque nœud, ou None si nx-cugraph n'est pas disponible
+        (la mise en page est alors laissée à la physique de vis.js dans le navigateur)
+    """
+    if nx_cugraph is None or not hasattr(nx, 'forceatlas2_layout'):
+        return None
+
+    graph = nx.Graph()
+    graph.add_nodes_from(node_urls)
+    graph.add_weighted_edges_from(weighted_edges)
+
+    try:
+        positions = nx.forceatlas2_layout(graph, weight='weight', seed=0, backend='cugraph')
+    except NotImplementedError:  # version de nx-cugraph sans forceAtlas2
+        return None
+
+    return nx.rescale_layout_dict(positions, scale=LAYOUT_SCALE_PER_NODE * np.sqrt(len(node_urls)))
+
+
 def create_similarity_network(related_pages: Dict[str, List[Dict]], min_score: float = 0.5) -> str:
     """Crée une visualisation interactive du réseau de similarité entre les pages."""
     net = Network(height="800px", width="100%", bgcolor="#ffffff", font_color="black")
 
+    # Sérialiser les nœuds et les liens du template avec orjson, si installé
+    if orjson is not None:
+        net.templateEnv.policies['json.dumps_function'] = orjson_dumps
+
     # Configuration de la physique pour une meilleure visualisation des clusters
     physics_options = {
         "physics": {
@@ -123,19 +260,16 @@ def create_similarity_network(related_pages: Dict[str, List[Dict]], min_score: f
             "zoomView": True  # Permet le zoom
         }
     }
-    net.set_options(json.dumps(physics_options))
+
+    # Ne garder qu'une seule fois les relations au-dessus du score minimum
+    related_pages = filter_relations(related_pages, min_score)
 
     # Calcul du degré de connectivité de chaque nœud
-    connectivity = {}
+    # (chaque lien retenu compte pour ses deux extrémités ; une URL absente vaut 0) : les cibles
+    # sont comptées en un passage C, chaque source ajoute directement le nombre de ses liens
+    connectivity = Counter(map(itemgetter('url'), chain.from_iterable(related_pages.values())))
     for source_url, similar_pages in related_pages.items():
-        if source_url not in connectivity:
-            connectivity[source_url] = 0
-        for page in similar_pages:
-            if page['score'] >= min_score:
-                connectivity[source_url] += 1
-                if page['url'] not in connectivity:
-                    connectivity[page['url']] = 0
-                connectivity[page['url']] += 1
+        connectivity[source_url] += len(similar_pages)
 
     # Définir la palette de couleurs pour les clusters
     themes_colors = {
@@ -143,78 +277,117 @@ def create_similarity_network(related_pages: Dict[str, List[Dict]], min_score: f
         'secondary': ['#EE5253', '#2D98DA', '#20BF6B', '#FA8231', '#8854D0']  # Nuances plus foncées
     }
 
-    added_urls = set()
-    theme_index = 0
+    # Dégradés (10 nuances) entre couleur principale et secondaire de chaque palette, calculés une seule fois
+    gradient_lut = [
+        [color.hex_l for color in Color(base_color).range_to(Color(sec_color), 10)]
+        for base_color, sec_color in zip(themes_colors['primary'], themes_colors['secondary'])
+    ]
+
+    # Connectivité maximale, calculée une seule fois pour normaliser celle de chaque nœud
+    max_conn = max(connectivity.values(), default=0)
 
     # Fonction pour obtenir une couleur basée sur la connectivité
     def get_node_color(url: str, theme_idx: int) -> str:
-        base_color = themes_colors['primary'][theme_idx % len(themes_colors['primary'])]
-        sec_color = themes_colors['secondary'][theme_idx % len(themes_colors['secondary'])]
-
         # Normaliser la connectivité entre 0 et 1
-        max_conn = max(connectivity.values())
         norm_conn = connectivity[url] / max_conn if max_conn > 0 else 0
 
-        # Mélanger les couleurs en fonction de la connectivité
-        from colour import Color
-        c1 = Color(base_color)
-        c2 = Color(sec_color)
-        gradient = list(c1.range_to(c2, 10))
-        color_idx = int(norm_conn * 9)
-        return gradient[color_idx].hex_l
+        # Nuance du dégradé correspondant à la connectivité
+        return gradient_lut[theme_idx % len(gradient_lut)][int(norm_conn * 9)]
 
+    # Premier passage : ensemble ordonné des nœuds et de leur palette (chaque nouvelle source
+    # passe à la palette suivante, ses pages similaires reprennent la palette courante)
+    node_themes: Dict[str, int] = {}
+    theme_index = 0
     for source_url, similar_pages in related_pages.items():
-        # Déterminer la thématique et la couleur du nœud source
-        source_theme = extract_theme_from_url(source_url)
-
-        if source_url not in added_urls:
-            source_color = get_node_color(source_url, theme_index)
-            net.add_node(
-                source_url,
-                label=get_readable_label(source_url),
-                title=f"{source_url}\nConnectivité: {connectivity[source_url]}",
-                color=source_color,
-                size=20 + (connectivity[source_url] * 2),  # Taille basée sur la connectivité
-                font={'size': 12, 'face': 'Arial'},
-                shape='dot'
-            )
-            added_urls.add(source_url)
+        if source_url not in node_themes:
+            node_themes[source_url] = theme_index
             theme_index = (theme_index + 1) % len(themes_colors['primary'])
+        for page in similar_pages:
+            node_themes.setdefault(page['url'], theme_index)
+
+    # Nœuds et liens ajoutés directement aux listes de pyvis : add_node et add_edge vérifient
+    # l'existence des nœuds et des liens par un parcours de liste à chaque appel
+    for url, theme_idx in node_themes.items():
+        # Mêmes options que Network.add_node (la police du réseau remplace celle du nœud)
+        node = {
+            'color': get_node_color(url, theme_idx),
+            'title': f"{url}\nConnectivité: {connectivity[url]}",
+            'size': 20 + (connectivity[url] * 2),  # Taille basée sur la connectivité
+            'font': {'color': net.font_color},
+            'id': url,
+            'label': get_readable_label(url) or url,
+            'shape': 'dot'
+        }
+        net.nodes.append(node)
+        net.node_ids.append(url)
+        net.node_map[url] = node
 
+    # Second passage : les liens, tous les nœuds étant déjà présents
+    added_edges = set()
+    for source_url, similar_pages in related_pages.items():
         for page in similar_pages:
-            if page['score'] >= min_score:
-                target_url = page['url']
-                target_theme = extract_theme_from_url(target_url)
-
-                if target_url not in added_urls:
-                    target_color = get_node_color(target_url, theme_index)
-                    net.add_node(
-                        target_url,
-                        label=get_readable_label(target_url),
-                        title=f"{target_url}\nConnectivité: {connectivity[target_url]}",
-                        color=target_color,
-                        size=20 + (connectivity[target_url] * 2),
-                        font={'size': 12, 'face': 'Arial'},
-                        shape='dot'
-                    )
-                    added_urls.add(target_url)
-
-                # Lien avec épaisseur et couleur proportionnelles au score
-                edge_width = page['score'] * 3
-                # Utiliser une couleur semi-transparente pour les liens
-                edge_alpha = page['score']  # Score comme niveau de transparence
-                edge_color = f"rgba(128, 128, 128, {edge_alpha})"
-
-                net.add_edge(
-                    source_url,
-                    target_url,
-                    value=edge_width,
-                    title=f"Score: {page['score']:.3f}",
-                    color=edge_color,
-                    smooth={'type': 'continuous'}
-                )
-
-    # Sauvegarder le graphe dans un fichier temporaire
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.html') as tmp_file:
-        net.save_graph(tmp_file.name)
-        return tmp_file.name
\ No newline at end of file
+            target_url = page['url']
+
+            # Graphe non orienté : un seul lien par paire de pages, comme Network.add_edge
+            edge_key = frozenset((source_url, target_url))
+            if edge_key in added_edges:
+                continue
+            added_edges.add(edge_key)
+
+            # Lien avec épaisseur et couleur proportionnelles au score
+            edge_width = page['score'] * 3
+            # Utiliser une couleur semi-transparente pour les liens (score quantifié comme transparence)
+            edge_level = min(max(int(page['score'] * (EDGE_COLOR_LEVELS - 1)), 0), EDGE_COLOR_LEVELS - 1)
+            edge_color = EDGE_COLORS[edge_level]
+
+            net.edges.append({
+                'value': edge_width,
+                'title': f"Score: {page['score']:.3f}",
+                'color': edge_color,
+                'smooth': {'type': 'continuous'},
+                'from': source_url,
+                'to': target_url
+            })
+
+    # Grands réseaux : positions précalculées sur GPU et physique désactivée dans le navigateur
+    if len(node_themes) >= LAYOUT_PRECOMPUTE_MIN_NODES:
+        positions = compute_gpu_layout(
+            net.node_ids,
+            ((edge['from'], edge['to'], edge['value']) for edge in net.edges)  # poids = épaisseur du lien
+        )
+        if positions is not None:
+            for node in net.nodes:
+                x, y = positions[node['id']]
+                node['x'], node['y'] = float(x), float(y)
+            physics_options['physics']['enabled'] = False
+
+    net.set_options(json.dumps(physics_options))
+
+    # Sauvegarder le graphe dans un fichier temporaire : le template est rendu au fil de l'eau
+    # (mêmes paramètres que Network.generate_html) dans le descripteur ouvert par mkstemp, avec
+    # un grand tampon, sans construire la page complète en mémoire ni rouvrir le fichier par son nom
+    nodes, edges, heading, height, width, options = net.get_network_data()
+    template = net.templateEnv.get_template(net.path)
+    fd, html_path = tempfile.mkstemp(suffix='.html')
+    with os.fdopen(fd, 'w', encoding='utf-8', buffering=HTML_WRITE_BUFFER_SIZE) as html_file:
+        template.stream(
+            height=height,
+            width=width,
+            nodes=nodes,
+            edges=edges,
+            heading=heading,
+            options=options,
+            physics_enabled=physics_options['physics'].get('enabled', True),
+            use_DOT=net.use_DOT,
+            dot_lang=net.dot_lang,
+            widget=net.widget,
+            bgcolor=net.bgcolor,
+            conf=net.conf,
+            tooltip_link=any('href' in node['title'] for node in net.nodes),
+            neighborhood_highlight=net.neighborhood_highlight,
+            select_menu=net.select_menu,
+            filter_menu=net.filter_menu,
+            notebook=False,
+            cdn_resources=net.cdn_resources
+        ).dump(html_file)
+    return html_path
\ No newline at end of file